@@ -3,17 +3,48 @@
 """
 import requests
 import json
+import heapq
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from http_client import HttpClient
+from retry_policy import CircuitOpenError
+
+# 自动选择每页条数时依次尝试的大小，30为接口默认值
+PAGE_SIZE_CANDIDATES = (100, 50, 30)
+DEFAULT_PAGE_SIZE = 30
+# 历史回填最早分片的开始年份，早于沪深交易所成立，相当于不限开始日期
+EARLIEST_YEAR = 1990
 
 class AnnouncementFetcher:
     """公告获取类"""
     
-    def __init__(self, cache_manager=None):
+    def __init__(self, cache_manager=None, http_client=None, backfill_workers=0, backfill_start_year=2000, prefetch_window=1):
+        """
+        Args:
+            cache_manager (CacheManager): 缓存管理器
+            http_client (HttpClient): 共享HTTP客户端
+            backfill_workers (int): 历史回填的并发年份数，大于1时不限日期的查询按年份分片并发获取
+            backfill_start_year (int): 历史回填的起始年份
+            prefetch_window (int): 同时预取的页数，1表示逐页请求
+        """
         self.query_url = "https://www.cninfo.com.cn/new/hisAnnouncement/query"
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Content-Type': 'application/x-www-form-urlencoded'
         }
         self.cache_manager = cache_manager
+        self.http_client = http_client or HttpClient()
+        self.backfill_workers = int(backfill_workers)
+        self.backfill_start_year = int(backfill_start_year)
+        self.prefetch_window = max(1, int(prefetch_window))
+        self.page_size = None  # 已确认可用的每页条数
+        self._stats_lock = threading.Lock()
+        # 列表请求次数，以及每页30条时需要的次数
+        # pages: 处理的页数（含缓存）；requests: 实际发往服务端的列表请求数；cached: 来自缓存的页数
+        self.list_stats = {'pages': 0, 'requests': 0, 'cached': 0, 'baseline': 0, 'failed_pages': 0}
+        # 有页面重试后仍获取失败的分类，列表不完整
+        self.incomplete_categories = set()
     
     def get_plate_param(self, plate):
         """
@@ -21,7 +52,7 @@ class AnnouncementFetcher:
         
         Args:
             plate (str): 板块代码
-            
+        
         Returns:
             str: plate参数值
         """
@@ -34,7 +65,28 @@ class AnnouncementFetcher:
         else:
             return plate
     
-    def fetch_announcements_generator(self, stock_code, org_id, plate, category, page_size=30, category_value=None):
+    def build_se_date(self, since_ms, until=None):
+        """
+        构造seDate日期区间参数
+        
+        Args:
+            since_ms (int): 起始公告时间（毫秒时间戳），区间包含当天
+            until (datetime): 截止日期，默认为今天
+        
+        Returns:
+            str: 形如 "2024-01-01~2024-06-30"
+        """
+        start = datetime.fromtimestamp(since_ms / 1000).strftime('%Y-%m-%d')
+        end = (until or datetime.now()).strftime('%Y-%m-%d')
+        return f"{start}~{end}"
+    
+    def reset_list_stats(self):
+        """清零列表请求统计"""
+        with self._stats_lock:
+            self.list_stats = {'pages': 0, 'requests': 0, 'cached': 0, 'baseline': 0, 'failed_pages': 0}
+            self.incomplete_categories = set()
+    
+    def fetch_announcements_generator(self, stock_code, org_id, plate, category, page_size=None, category_value=None, use_cache=True, se_date='', searchkeys=None, start_page=1, on_page=None):
         """
         获取公告列表的生成器，逐页返回公告
         
@@ -43,90 +95,353 @@ class AnnouncementFetcher:
             org_id (str): 机构ID
             plate (str): 板块代码
             category (str): 公告分类
-            page_size (int): 每页数量
+            page_size (int): 每页数量，None表示自动选择接口接受的最大值
             category_value (str): 分类中文名
+            use_cache (bool): 是否使用公告查询缓存
+            se_date (str): 日期区间（如 "2024-01-01~2024-06-30"），空字符串表示不限
+            searchkeys (list): 标题关键词，非空时每个关键词由服务端单独查询，结果合并去重
+            start_page (int): 起始页码，断点续传时从上次的页码继续（需同时给出上次的page_size）
+            on_page (callable): 一页公告全部返回给调用方后调用，参数为 (下一页页码, 每页条数)；
+                                按关键词查询和历史回填时结果由多路合并，不调用
         Yields:
             dict: 单个公告信息
         """
-        page_num = 1
-        plate_param = self.get_plate_param(plate)
         total_count = 0
+        if searchkeys:
+            pages = self._fetch_searchkeys(stock_code, org_id, plate, category, page_size, category_value, use_cache, se_date, searchkeys)
+        elif self.backfill_workers > 1 and not se_date:
+            pages = self._fetch_shards(stock_code, org_id, plate, category, page_size, category_value, use_cache)
+        else:
+            pages = self._fetch_pages(
+                stock_code, org_id, plate, category, page_size, category_value, use_cache, se_date,
+                start_page=start_page, on_page=on_page
+            )
+        try:
+            for announcement in pages:
+                total_count += 1
+                yield announcement
+        finally:
+            pages.close()
         
-        while True:
+        print(f"总共获取到 {total_count} 条公告")
+    
+    def _fetch_searchkeys(self, stock_code, org_id, plate, category, page_size, category_value, use_cache, se_date, searchkeys):
+        """
+        每个关键词通过searchkey参数单独查询，按公告时间从新到旧合并，按announcementId去重
+        
+        Yields:
+            dict: 单个公告信息
+        """
+        print(f"按关键词查询: {'、'.join(searchkeys)}")
+        streams = [
+            self._fetch_pages(stock_code, org_id, plate, category, page_size, category_value, use_cache, se_date, searchkey)
+            for searchkey in searchkeys
+        ]
+        seen = set()
+        try:
+            for announcement in heapq.merge(*streams, key=lambda item: -(item.get('announcementTime') or 0)):
+                announcement_id = announcement.get('announcementId')
+                if announcement_id in seen:
+                    continue
+                if announcement_id:
+                    seen.add(announcement_id)
+                yield announcement
+        finally:
+            for stream in streams:
+                stream.close()
+    
+    def _fetch_shards(self, stock_code, org_id, plate, category, page_size, category_value, use_cache):
+        """
+        按年份把历史分片，并发获取各年份的公告
+        
+        从今年到起始年份依次返回各分片的结果（与不分片时同样按时间从新到旧），
+        按announcementId去重。起始年份的分片不限开始日期，包含更早的公告，与不分片时覆盖的范围相同。
+        生成器被提前关闭时通知其余分片停止翻页。
+        
+        Yields:
+            dict: 单个公告信息
+        """
+        years = list(range(datetime.now().year, self.backfill_start_year - 1, -1))
+        print(f"历史回填: {years[-1]}年及以前-{years[0]}年共{len(years)}个分片，并发{self.backfill_workers}个")
+        stop = threading.Event()
+        
+        def fetch_shard(year):
+            announcements = []
+            pages = self._fetch_pages(
+                stock_code, org_id, plate, category, page_size, category_value, use_cache,
+                f"{year if year != years[-1] else EARLIEST_YEAR}-01-01~{year}-12-31"
+            )
             try:
-                data = {
-                    'stock': f"{stock_code},{org_id}",
-                    'tabName': 'fulltext',
-                    'pageSize': page_size,
-                    'pageNum': page_num,
-                    'column': plate,
-                    'category': category,
-                    'plate': plate_param,
-                    'seDate': '',
-                    'searchkey': '',
-                    'secid': '',
-                    'sortName': '',
-                    'sortType': '',
-                    'isHLtitle': 'true'
-                }
-                
-                # 检查缓存
-                if self.cache_manager:
-                    cached_result = self.cache_manager.load_announcement_cache(
-                        data['stock'], page_num, category, plate, plate_param, 
-                        data['searchkey'], data['seDate'], category_value
-                    )
-                    if cached_result:
-                        result = cached_result
+                for announcement in pages:
+                    if stop.is_set():
+                        break
+                    announcements.append(announcement)
+            finally:
+                pages.close()
+            return announcements
+        
+        executor = ThreadPoolExecutor(max_workers=self.backfill_workers)
+        try:
+            futures = [executor.submit(fetch_shard, year) for year in years]
+            seen = set()
+            for year, future in zip(years, futures):
+                announcements = future.result()
+                if announcements:
+                    print(f"{year}年{'及以前' if year == years[-1] else ''}获取到 {len(announcements)} 条公告")
+                for announcement in announcements:
+                    announcement_id = announcement.get('announcementId')
+                    if announcement_id in seen:
+                        continue
+                    if announcement_id:
+                        seen.add(announcement_id)
+                    yield announcement
+        finally:
+            stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    def _fetch_pages(self, stock_code, org_id, plate, category, page_size, category_value, use_cache, se_date, searchkey='', start_page=1, on_page=None):
+        """
+        逐页获取一个日期区间内的公告
+        
+        第1页返回总页数后，后续页在不超过预取窗口的范围内并发请求，仍按页码顺序返回。
+        不使用缓存（增量更新）时调用方可能在第1页就停止，等第1页的公告全部取走后才开始预取。
+        未指定每页条数时由第1页探测接口接受的最大值。从中间的页码开始时由该页返回总页数。
+        
+        Yields:
+            dict: 单个公告信息
+        """
+        page_num = start_page
+        adaptive = page_size is None and start_page == 1
+        if page_size is None:
+            page_size = self._preferred_page_size()
+        total = 0  # 第1页被截断时，按公告总数判断是否还有下一页
+        fetched_pages = 0
+        fetched_count = 0
+        last_page = 0  # 第1页报告的总页数
+        next_prefetch = start_page + 1  # 下一个待预取的页码
+        prefetched = {}  # 页码 -> Future
+        executor = ThreadPoolExecutor(max_workers=self.prefetch_window) if self.prefetch_window > 1 else None
+        
+        def prefetch():
+            """发出窗口内尚未请求的后续页"""
+            nonlocal next_prefetch
+            while next_prefetch <= min(last_page, page_num + self.prefetch_window):
+                prefetched[next_prefetch] = executor.submit(
+                    self._fetch_page,
+                    stock_code, org_id, plate, category, page_size, category_value, use_cache, se_date, next_prefetch, searchkey
+                )
+                next_prefetch += 1
+        
+        try:
+            while True:
+                try:
+                    if page_num in prefetched:
+                        result = prefetched.pop(page_num).result()
+                    elif page_num == 1 and adaptive:
+                        result, page_size, total, attempts = self._probe_first_page(
+                            stock_code, org_id, plate, category, page_size, category_value, use_cache, se_date, searchkey
+                        )
+                        fetched_pages += attempts - 1
                     else:
-                        # 发送请求
-                        response = requests.post(self.query_url, data=data, headers=self.headers)
-                        response.raise_for_status()
-                        result = response.json()
-                        
-                        # 保存到缓存
-                        self.cache_manager.save_announcement_cache(
-                            data['stock'], page_num, category, plate, plate_param,
-                            data['searchkey'], data['seDate'], result, category_value
+                        result = self._fetch_page(
+                            stock_code, org_id, plate, category, page_size, category_value, use_cache, se_date, page_num, searchkey
                         )
-                else:
-                    # 没有缓存管理器，直接发送请求
-                    response = requests.post(self.query_url, data=data, headers=self.headers)
-                    response.raise_for_status()
-                    result = response.json()
+                except json.JSONDecodeError as e:
+                    print(f"解析公告列表响应失败 (第{page_num}页): {e}")
+                    result = None
+                except requests.exceptions.RequestException as e:
+                    print(f"请求公告列表失败 (第{page_num}页): {e}")
+                    result = None
+                    if isinstance(e, CircuitOpenError):
+                        last_page = 0
+                except Exception as e:
+                    print(f"获取公告列表时发生错误 (第{page_num}页): {e}")
+                    result = None
                 
-                if 'announcements' in result:
-                    announcements = result['announcements']
-                    if not announcements:
-                        announcements = []
-                    
-                    print(f"第{page_num}页获取到 {len(announcements)} 条公告")
-                    
-                    # 逐条返回公告
-                    for announcement in announcements:
-                        total_count += 1
-                        yield announcement
-                    
-                    # 检查是否还有更多页
-                    if not result.get('hasMore', False):
-                        break
-                    
-                    page_num += 1
-                else:
-                    print(f"第{page_num}页响应格式异常")
+                if result is None or 'announcements' not in result:
+                    if result is not None:
+                        print(f"第{page_num}页响应格式异常")
+                    self._mark_incomplete(category)
+                    # 已知总页数时跳过这一页继续获取后面的页，否则无法判断是否还有下一页
+                    if page_num < last_page:
+                        print(f"跳过第{page_num}页，分类列表不完整")
+                        page_num += 1
+                        continue
                     break
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"请求公告列表失败 (第{page_num}页): {e}")
-                break
-            except json.JSONDecodeError as e:
-                print(f"解析公告列表响应失败 (第{page_num}页): {e}")
-                break
+                announcements = result['announcements']
+                if not announcements:
+                    announcements = []
+                fetched_pages += 1
+                fetched_count += len(announcements)
+                
+                print(f"第{page_num}页获取到 {len(announcements)} 条公告")
+                
+                if page_num == start_page:
+                    last_page = self._total_pages(result, page_size)
+                    if start_page > 1:
+                        # 续传时没有探测第1页，按公告总数判断每页条数被截断时是否还有下一页
+                        total = self._total_count(result)
+                # 根据第1页的总数并发预取后续页，先发出请求再返回本页公告
+                if executor and (use_cache or page_num > start_page):
+                    prefetch()
+                
+                # 逐条返回公告
+                for announcement in announcements:
+                    yield announcement
+                if on_page:
+                    on_page(page_num + 1, page_size)
+                # 调用方取完本页仍在继续，增量更新时从这里开始预取
+                if executor:
+                    prefetch()
+                
+                # 检查是否还有更多页
+                if not result.get('hasMore', False) and not (announcements and page_num * page_size < total):
+                    break
+                
+                page_num += 1
+        finally:
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+            with self._stats_lock:
+                self.list_stats['pages'] += fetched_pages
+                self.list_stats['baseline'] += max(1, -(-fetched_count // DEFAULT_PAGE_SIZE))
+    
+    def _mark_incomplete(self, category):
+        """记录分类的公告列表有页面获取失败"""
+        with self._stats_lock:
+            self.list_stats['failed_pages'] += 1
+            self.incomplete_categories.add(category)
+    
+    def _preferred_page_size(self):
+        """当前使用的每页条数：已确认的值，其次是缓存中记录的值，都没有时从最大候选值开始探测"""
+        if self.page_size is None and self.cache_manager:
+            self.page_size = self.cache_manager.load_page_size(self.query_url)
+        return self.page_size or PAGE_SIZE_CANDIDATES[0]
+    
+    def _remember_page_size(self, page_size):
+        """记录已确认可用的每页条数"""
+        if page_size == self.page_size:
+            return
+        self.page_size = page_size
+        print(f"公告列表每页条数: {page_size}")
+        if self.cache_manager:
+            self.cache_manager.save_page_size(self.query_url, page_size)
+    
+    def _probe_first_page(self, stock_code, org_id, plate, category, page_size, category_value, use_cache, se_date, searchkey=''):
+        """
+        以尽量大的每页条数获取第1页
+        
+        请求出错或响应格式异常时改用更小的候选值重试；返回条数少于请求条数但还有更多公告时，
+        说明服务端截断了每页条数，此后按实际返回的条数翻页。
+        
+        Returns:
+            tuple: (第1页响应, 每页条数, 公告总数（未截断时为0）, 请求次数)
+        """
+        smaller = [size for size in PAGE_SIZE_CANDIDATES if size < page_size]
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                result = self._fetch_page(
+                    stock_code, org_id, plate, category, page_size, category_value, use_cache, se_date, 1, searchkey
+                )
+                if 'announcements' not in result:
+                    raise ValueError("响应格式异常")
             except Exception as e:
-                print(f"获取公告列表时发生错误 (第{page_num}页): {e}")
-                break
+                if not smaller:
+                    raise
+                print(f"每页{page_size}条获取失败（{e}），改为每页{smaller[0]}条")
+                page_size = smaller.pop(0)
+                continue
+            break
         
-        print(f"总共获取到 {total_count} 条公告")
+        announcements = result['announcements'] or []
+        total = self._total_count(result)
+        if announcements and len(announcements) < page_size and (result.get('hasMore') or total > len(announcements)):
+            print(f"每页{page_size}条被截断为{len(announcements)}条")
+            page_size = len(announcements)
+            self._remember_page_size(page_size)
+            return result, page_size, total, attempts
+        if len(announcements) == page_size or attempts > 1:
+            # 返回了整页，或更大的值已确认不可用
+            self._remember_page_size(page_size)
+        return result, page_size, 0, attempts
+    
+    def _total_count(self, result):
+        """从响应中读取公告总数，没有时返回0"""
+        try:
+            return int(result.get('totalRecordNum') or result.get('totalAnnouncement') or 0)
+        except (TypeError, ValueError):
+            return 0
+    
+    def _total_pages(self, result, page_size):
+        """
+        从响应中读取总页数
+        
+        Returns:
+            int: 总页数，响应中没有时返回0
+        """
+        # 每页条数可能被服务端截断，优先按公告总数计算
+        total = self._total_count(result)
+        if total:
+            return -(-total // int(page_size))
+        try:
+            return int(result.get('totalpages') or 0)
+        except (TypeError, ValueError):
+            return 0
+    
+    def _fetch_page(self, stock_code, org_id, plate, category, page_size, category_value, use_cache, se_date, page_num, searchkey=''):
+        """
+        获取一页公告列表，优先使用缓存
+        
+        Returns:
+            dict: 接口响应
+        """
+        plate_param = self.get_plate_param(plate)
+        cache_manager = self.cache_manager if use_cache else None
+        data = {
+            'stock': f"{stock_code},{org_id}",
+            'tabName': 'fulltext',
+            'pageSize': page_size,
+            'pageNum': page_num,
+            'column': plate,
+            'category': category,
+            'plate': plate_param,
+            'seDate': se_date,
+            'searchkey': searchkey,
+            'secid': '',
+            'sortName': '',
+            'sortType': '',
+            'isHLtitle': 'true'
+        }
+        
+        def request():
+            # 发送请求
+            with self._stats_lock:
+                self.list_stats['requests'] += 1
+            result = self.http_client.post_json(self.query_url, data=data, headers=self.headers)
+            
+            # 保存到缓存
+            if cache_manager:
+                cache_manager.save_announcement_cache(
+                    data['stock'], page_num, category, plate, plate_param,
+                    data['searchkey'], data['seDate'], result, category_value, page_size
+                )
+            return result
+        
+        # 检查缓存，缓存过期但在宽限期内时先返回旧数据，后台重新请求
+        if cache_manager:
+            cached_result = cache_manager.load_announcement_cache(
+                data['stock'], page_num, category, plate, plate_param, 
+                data['searchkey'], data['seDate'], category_value, page_size,
+                revalidate=request
+            )
+            if cached_result:
+                with self._stats_lock:
+                    self.list_stats['cached'] += 1
+                return cached_result
+        
+        return request()
     
     def fetch_announcements(self, stock_code, org_id, plate, category, page_size=30):
         """
@@ -138,7 +453,7 @@ class AnnouncementFetcher:
             plate (str): 板块代码
             category (str): 公告分类
             page_size (int): 每页数量
-            
+        
         Returns:
             list: 公告列表
         """
@@ -0,0 +1,161 @@
+"""
+批量下载程序 - 按自选股列表并行下载多只股票的公告
+"""
+import os
+import sys
+import json
+from multiprocessing import Pool
+from config import Config
+from main import AnnouncementDownloader
+from http_client import HttpClient
+from rate_limiter import RateLimiter
+from dotenv import load_dotenv
+
+# 工作进程内复用的下载器和运行参数
+_worker_downloader = None
+_worker_category_filter = None
+_worker_incremental_update = False
+_worker_resume = False
+
+def load_watchlist(file_path):
+    """
+    读取自选股列表文件
+    
+    每行一个或多个股票代码/名称，支持中英文逗号、分号和空白分隔，#开头为注释。
+    
+    Args:
+        file_path (str): 列表文件路径
+    
+    Returns:
+        list: 去重后的股票代码列表（保持原顺序）
+    """
+    stock_codes = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            for sep in [',', '，', ';', '；']:
+                line = line.replace(sep, ' ')
+            for code in line.split():
+                if code not in stock_codes:
+                    stock_codes.append(code)
+    return stock_codes
+
+def _init_worker(rate_limiter, category_filter, incremental_update, resume):
+    """工作进程初始化：每个进程只创建一次下载器，复用配置和连接"""
+    global _worker_downloader, _worker_category_filter, _worker_incremental_update, _worker_resume
+    _worker_downloader = AnnouncementDownloader(rate_limiter=rate_limiter)
+    _worker_category_filter = category_filter
+    _worker_incremental_update = incremental_update
+    _worker_resume = resume
+
+def _process_stock(stock_code):
+    """在工作进程中处理单只股票，返回统计结果"""
+    try:
+        success = _worker_downloader.run(stock_code, _worker_category_filter, _worker_incremental_update, _worker_resume)
+    except Exception as e:
+        print(f"处理股票 {stock_code} 时发生错误: {e}")
+        success = False
+    return {
+        'stock_code': stock_code,
+        'success': success,
+        **_worker_downloader.summary
+    }
+
+def run_batch(stock_codes, category_filter=None, incremental_update=False, workers=4, host_limits=None, default_rate=0, resume=False):
+    """
+    使用进程池批量处理股票
+    
+    所有进程共用缓存根目录（各股票缓存在各自子目录下）和同一个全局限速器。
+    
+    Args:
+        stock_codes (list): 股票代码列表
+        category_filter (str|None): 分类过滤（中文名或key）
+        incremental_update (bool): 是否增量更新
+        workers (int): 工作进程数
+        host_limits (dict): 主机名 -> 所有进程合计每秒请求数上限
+        default_rate (float): 未配置主机的每秒请求数上限，0表示不限速
+        resume (bool): 是否从各股票上次中断的分类和页码继续，已完成的股票不再请求公告列表
+    
+    Returns:
+        list: 每只股票的统计结果
+    """
+    rate_limiter = RateLimiter(host_limits, default_rate)
+    workers = max(1, min(int(workers), len(stock_codes)))
+    with Pool(
+        processes=workers,
+        initializer=_init_worker,
+        initargs=(rate_limiter, category_filter, incremental_update, resume)
+    ) as pool:
+        return list(pool.imap(_process_stock, stock_codes))
+
+def print_summary(results):
+    """打印批量下载汇总"""
+    print("\n" + "=" * 50)
+    print("批量下载汇总")
+    print("=" * 50)
+    print(f"{'股票':<10}{'状态':<6}{'下载':>8}{'跳过':>8}{'失败':>8}")
+    for item in results:
+        status = "成功" if item['success'] else "失败"
+        print(f"{item['stock_code']:<10}{status:<6}{item['downloaded']:>8}{item['skipped']:>8}{item['failed']:>8}")
+    print("-" * 50)
+    print(
+        f"共 {len(results)} 只股票，失败 {sum(1 for item in results if not item['success'])} 只；"
+        f"下载 {sum(item['downloaded'] for item in results)} 个，"
+        f"跳过 {sum(item['skipped'] for item in results)} 个，"
+        f"失败 {sum(item['failed'] for item in results)} 个"
+    )
+    incomplete = sum(item.get('incomplete', 0) for item in results)
+    print(f"请求重试 {sum(item.get('retries', 0) for item in results)} 次" + (f"，{incomplete} 个分类的公告列表不完整" if incomplete else ""))
+
+def main():
+    """主函数"""
+    load_dotenv()
+    # --resume：从上次中断处继续
+    args = [arg for arg in sys.argv[1:] if arg != '--resume']
+    resume = len(args) < len(sys.argv) - 1
+    if args:
+        watchlist_file = args[0]
+        category_filter = args[1] if len(args) > 1 else None
+    else:
+        watchlist_file = os.getenv("WATCHLIST_FILE")
+        category_filter = os.getenv("CATEGORY_FILTER")
+        if not watchlist_file:
+            print("使用方法: python batch.py <自选股列表文件> [分类名或key] [--resume] 或在.env中设置WATCHLIST_FILE")
+            print("示例: python batch.py watchlist.txt 年报")
+            return
+    incremental_update = os.getenv("INCREMENTAL_UPDATE", "false").lower() == "true"
+    
+    if not os.path.exists(watchlist_file):
+        print(f"自选股列表文件不存在: {watchlist_file}")
+        sys.exit(1)
+    stock_codes = load_watchlist(watchlist_file)
+    if not stock_codes:
+        print(f"自选股列表为空: {watchlist_file}")
+        sys.exit(1)
+    print(f"共 {len(stock_codes)} 只股票，使用 {min(Config.BATCH_WORKERS, len(stock_codes))} 个进程")
+    # 启动进程前刷新一次股票目录，各进程从目录中解析股票，不再逐只搜索
+    Config.create_stock_directory().refresh_if_stale(HttpClient(retry_policy=Config.create_retry_policy()))
+    
+    results = run_batch(
+        stock_codes,
+        category_filter,
+        incremental_update,
+        workers=Config.BATCH_WORKERS,
+        host_limits=RateLimiter.parse_host_limits(Config.RATE_LIMITS),
+        default_rate=Config.RATE_LIMIT,
+        resume=resume
+    )
+    print_summary(results)
+    
+    # 汇总结果保存到下载目录
+    os.makedirs(Config.DOWNLOADS_DIR, exist_ok=True)
+    summary_path = os.path.join(Config.DOWNLOADS_DIR, "batch_summary.json")
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"汇总结果已保存: {summary_path}")
+    
+    if any(not item['success'] for item in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,763 @@
+"""
+缓存后端模块 - 缓存数据的实际存储方式（文件目录或SQLite单文件）
+"""
+import os
+import re
+import gzip
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 缓存类型 -> 文件后端的目录名
+CACHE_KINDS = {
+    'top_search': 'topSearchquery',
+    'stock': 'stock',
+    'announcement': 'hisAnnouncementquery',
+}
+
+# 压缩方式 -> 文件后端的文件名后缀
+COMPRESSIONS = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+# SQLite缓存命中时最多每隔多少秒更新一次访问时间
+ACCESS_UPDATE_INTERVAL = 3600
+# 公告查询缓存文件名中的市场代码（szse、sse、bj），用于解析早期版本的文件名
+LEGACY_COLUMNS = frozenset({'szse', 'sse', 'bj'})
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# 缓存中只保留程序用到的字段
+RESULT_FIELDS = ('announcements', 'hasMore', 'totalAnnouncement', 'totalRecordNum', 'totalpages')
+ANNOUNCEMENT_FIELDS = (
+    'adjunctUrl', 'adjunctSize', 'announcementTitle', 'secCode', 'secName', 'announcementId', 'announcementTime'
+)
+STOCK_FIELDS = ('code', 'orgId', 'zwjc', 'pinyin', 'category', 'sjstsBond')
+
+def resolve_compression(name):
+    """
+    检查压缩方式是否可用
+    
+    Args:
+        name (str): 'none'、'gzip' 或 'zstd'
+    
+    Returns:
+        str: 实际使用的压缩方式，zstd不可用时改用gzip
+    """
+    name = (name or 'none').lower()
+    if name not in COMPRESSIONS:
+        print(f"未知的缓存压缩方式: {name}，不压缩")
+        return 'none'
+    if name == 'zstd' and zstandard is None:
+        print("未安装zstandard，缓存改用gzip压缩")
+        return 'gzip'
+    return name
+
+def compact_data(kind, data):
+    """
+    去掉响应中程序用不到的字段
+    
+    Args:
+        kind (str): 缓存类型
+        data: 响应数据
+    
+    Returns:
+        只保留所需字段的数据，其他类型原样返回
+    """
+    if kind == 'announcement' and isinstance(data, dict):
+        result = {field: data[field] for field in RESULT_FIELDS if field in data}
+        if result.get('announcements'):
+            result['announcements'] = [
+                {field: item[field] for field in ANNOUNCEMENT_FIELDS if field in item}
+                for item in result['announcements']
+            ]
+        return result
+    if kind == 'top_search' and isinstance(data, list):
+        return [{field: item[field] for field in STOCK_FIELDS if field in item} for item in data]
+    return data
+
+def encode_data(data, compression='none'):
+    """
+    序列化为不含空白的JSON并按需压缩
+    
+    Returns:
+        bytes: 编码后的数据
+    """
+    raw = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if compression == 'gzip':
+        return gzip.compress(raw, mtime=0)
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor().compress(raw)
+    return raw
+
+def decode_data(raw):
+    """
+    按数据头识别压缩方式并反序列化，兼容早期版本缩进格式的JSON
+    
+    Args:
+        raw (bytes|str): 编码后的数据
+    """
+    if isinstance(raw, str):
+        return json.loads(raw)
+    if raw[:2] == GZIP_MAGIC:
+        raw = gzip.decompress(raw)
+    elif raw[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError("缓存使用zstd压缩，需要安装zstandard")
+        raw = zstandard.ZstdDecompressor().decompress(raw)
+    return json.loads(raw.decode('utf-8'))
+
+def scan_dir(path, recursive=True, with_stat=True):
+    """
+    用os.scandir统计目录下的文件
+    
+    Args:
+        path (str): 目录
+        recursive (bool): 是否包含子目录
+        with_stat (bool): 是否统计大小和修改时间（否则只计数）
+    
+    Returns:
+        dict: {'count', 'size', 'oldest', 'newest'}，时间为修改时间戳，没有文件时为None
+    """
+    result = {'count': 0, 'size': 0, 'oldest': None, 'newest': None}
+    stack = [path]
+    while stack:
+        try:
+            iterator = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with iterator:
+            for entry in iterator:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(entry.path)
+                    continue
+                result['count'] += 1
+                if not with_stat:
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                result['size'] += stat.st_size
+                if result['oldest'] is None or stat.st_mtime < result['oldest']:
+                    result['oldest'] = stat.st_mtime
+                if result['newest'] is None or stat.st_mtime > result['newest']:
+                    result['newest'] = stat.st_mtime
+    return result
+
+def merge_stats(total, part):
+    """把scan_dir的统计结果合并到total中"""
+    total['count'] += part['count']
+    total['size'] += part['size']
+    for field, pick in (('oldest', min), ('newest', max)):
+        values = [value for value in (total[field], part[field]) if value is not None]
+        total[field] = pick(values) if values else None
+
+class FileCacheBackend:
+    """
+    文件缓存后端
+    
+    每条缓存一个文件，按股票分目录保存：
+    {cache_dir}/{股票代码}_{股票名称}/{topSearchquery|stock|hisAnnouncementquery}/...
+    压缩的缓存在文件名后加 .gz 或 .zst。
+    板块代码、每页条数等全局信息按条保存在缓存根目录的SQLite文件中，批量模式下多个进程可同时写入。
+    """
+    
+    META_FILENAME = "meta.sqlite3"
+    
+    def __init__(self, base_dir, compression='none'):
+        """
+        Args:
+            base_dir (str): 缓存根目录
+            compression (str): 写入时的压缩方式，'none'、'gzip' 或 'zstd'；读取时自动识别
+        """
+        self.base_dir = base_dir
+        self.compression = resolve_compression(compression)
+        self._local = threading.local()
+        self._legacy_meta_checked = set()
+        self.set_scope('')
+    
+    def set_scope(self, scope):
+        """
+        切换到指定股票的缓存目录
+        
+        Args:
+            scope (str): 股票目录名（{股票代码}_{股票名称}），空字符串表示缓存根目录
+        """
+        self.scope = scope
+        self.cache_dir = os.path.join(self.base_dir, scope) if scope else self.base_dir
+        for dir_name in CACHE_KINDS.values():
+            os.makedirs(os.path.join(self.cache_dir, dir_name), exist_ok=True)
+    
+    def kind_dir(self, kind):
+        """缓存类型对应的目录"""
+        return os.path.join(self.cache_dir, CACHE_KINDS[kind])
+    
+    def label(self, kind, key):
+        """缓存条目在日志中显示的名称（相对于类型目录的路径）"""
+        return os.path.relpath(self._path(kind, key), self.kind_dir(kind))
+    
+    def _path(self, kind, key, legacy=False):
+        """
+        缓存键对应的文件路径
+        
+        Args:
+            legacy (bool): 公告查询缓存按早期版本的文件名（页码在分类之前）
+        """
+        if kind == 'top_search':
+            key_word, max_num = key
+            return os.path.join(self.kind_dir(kind), f"{key_word}_{max_num}_topSearchquery.json")
+        if kind == 'stock':
+            stock_code, org_id, sjsts_bond = key
+            return os.path.join(self.kind_dir(kind), f"{stock_code}_{org_id}_{sjsts_bond}_disclosurestock.html")
+        stock, category, page_num, column, plate, searchkey, se_date, category_value = key[:8]
+        # 非默认每页条数时记在页码后，如 2p50
+        page = f"{page_num}p{key[8]}" if len(key) > 8 else page_num
+        # 清理参数中的特殊字符
+        safe_stock = stock.replace(',', '_')
+        safe_category = category.replace(';', '_')
+        safe_plate = plate.replace(';', '_')
+        safe_searchkey = searchkey.replace(' ', '_') if searchkey else 'empty'
+        safe_se_date = se_date.replace('-', '') if se_date else 'empty'
+        safe_category_value = category_value or 'unknown'
+        safe_category_value = safe_category_value.replace('/', '_').replace('\\', '_')
+        if legacy:
+            filename = f"{safe_stock}_{page}_{safe_category}_{column}_{safe_plate}_{safe_searchkey}_{safe_se_date}_hisAnnouncementquery.json"
+        else:
+            filename = f"{safe_stock}_{safe_category}_{page}_{column}_{safe_plate}_{safe_searchkey}_{safe_se_date}_hisAnnouncementquery.json"
+        return os.path.join(self.kind_dir(kind), safe_category_value, filename)
+    
+    def load(self, kind, key):
+        """
+        读取缓存
+        
+        Returns:
+            缓存数据，不存在时返回None
+        """
+        return self.load_entry(kind, key)[0]
+    
+    def load_entry(self, kind, key):
+        """
+        读取缓存及其写入时间，并把文件的访问时间记为现在（供按最近使用淘汰）
+        
+        Returns:
+            tuple: (缓存数据, 写入时间戳)，不存在时返回 (None, None)
+        """
+        cache_path = self._path(kind, key)
+        for path in self._variants(cache_path):
+            if os.path.exists(path):
+                data = self._read(kind, path)
+                saved_at = os.path.getmtime(path)
+                os.utime(path, (time.time(), saved_at))
+                return data, saved_at
+        if kind == 'announcement' and len(key) == 8:
+            # 早期版本保存时页码在分类之前，读到后改存为当前的文件名
+            legacy_path = self._path(kind, key, legacy=True)
+            if os.path.exists(legacy_path):
+                data = self._read(kind, legacy_path)
+                saved_at = os.path.getmtime(legacy_path)
+                self.save(kind, key, data)
+                os.utime(cache_path + COMPRESSIONS[self.compression], (time.time(), saved_at))
+                os.remove(legacy_path)
+                return data, saved_at
+        return None, None
+    
+    def save(self, kind, key, data):
+        """
+        写入缓存（只保留所需字段，按设定的方式压缩），并删除其他压缩方式的旧文件
+        
+        Returns:
+            str: 写入的文件路径
+        """
+        cache_path = self._path(kind, key)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        if kind == 'stock':
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            return cache_path
+        target = cache_path + COMPRESSIONS[self.compression]
+        with open(target, 'wb') as f:
+            f.write(encode_data(compact_data(kind, data), self.compression))
+        for path in self._variants(cache_path):
+            if path != target and os.path.exists(path):
+                os.remove(path)
+        return target
+    
+    def _variants(self, cache_path):
+        """缓存文件各种压缩方式的路径，当前压缩方式排在最前"""
+        suffixes = [COMPRESSIONS[self.compression]] + [s for s in COMPRESSIONS.values() if s != COMPRESSIONS[self.compression]]
+        return [cache_path + suffix for suffix in suffixes]
+    
+    def _read(self, kind, path):
+        """读取并解码单个缓存文件"""
+        if kind == 'stock':
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        with open(path, 'rb') as f:
+            return decode_data(f.read())
+    
+    def clear(self, kind):
+        """清理当前目录下指定类型的缓存"""
+        directory = self.kind_dir(kind)
+        if os.path.exists(directory):
+            for filename in os.listdir(directory):
+                file_path = os.path.join(directory, filename)
+                if os.path.isfile(file_path):
+                    os.remove(file_path)
+    
+    def count(self, kind):
+        """当前目录下指定类型的缓存数量（包括公告查询缓存的分类子目录）"""
+        return scan_dir(self.kind_dir(kind), with_stat=False)['count']
+    
+    def stats(self, workers=16):
+        """
+        统计每只股票每类缓存的条数、字节数和写入时间范围
+        
+        各类型目录本身和其下的每个分类子目录分别作为一个任务，多线程并行os.scandir后合并。
+        
+        Args:
+            workers (int): 线程数
+        
+        Returns:
+            list: [{'scope', 'kind', 'count', 'size', 'oldest', 'newest'}]，按股票目录和类型排序
+        """
+        jobs = []  # (scope, kind, 目录, 是否包含子目录)
+        for scope in self._scopes():
+            scope_dir = os.path.join(self.base_dir, scope) if scope else self.base_dir
+            for kind, dir_name in CACHE_KINDS.items():
+                kind_dir = os.path.join(scope_dir, dir_name)
+                try:
+                    with os.scandir(kind_dir) as iterator:
+                        subdirs = [entry.path for entry in iterator if entry.is_dir(follow_symlinks=False)]
+                except OSError:
+                    continue
+                jobs.append((scope, kind, kind_dir, False))
+                jobs.extend((scope, kind, subdir, True) for subdir in subdirs)
+        
+        totals = {}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = executor.map(lambda job: scan_dir(job[2], recursive=job[3]), jobs)
+            for (scope, kind, _, _), result in zip(jobs, results):
+                total = totals.setdefault((scope, kind), {'scope': scope, 'kind': kind, 'count': 0, 'size': 0, 'oldest': None, 'newest': None})
+                merge_stats(total, result)
+        return [totals[key] for key in sorted(totals) if totals[key]['count']]
+    
+    def _meta_connect(self):
+        """获取当前线程的全局信息数据库连接"""
+        conn = getattr(self._local, 'meta_conn', None)
+        if conn is None:
+            os.makedirs(self.base_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.base_dir, self.META_FILENAME), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta ("
+                "name TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (name, key))"
+            )
+            conn.commit()
+            self._local.meta_conn = conn
+        return conn
+    
+    def _import_legacy_meta(self, name):
+        """早期版本把全局信息整体保存在缓存根目录的 {name}.json 中，首次读取时导入并删除"""
+        if name in self._legacy_meta_checked:
+            return
+        self._legacy_meta_checked.add(name)
+        meta_path = os.path.join(self.base_dir, f"{name}.json")
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"读取旧版缓存信息失败，跳过: {meta_path} ({e})")
+            return
+        conn = self._meta_connect()
+        conn.executemany(
+            "INSERT OR IGNORE INTO meta (name, key, value, updated_at) VALUES (?, ?, ?, ?)",
+            [(name, str(key), json.dumps(value, ensure_ascii=False), time.time()) for key, value in (data or {}).items()]
+        )
+        conn.commit()
+        self.remove(meta_path)
+    
+    def load_meta(self, name, key):
+        """
+        读取一条全局信息（如某个接口的每页条数）
+        
+        Args:
+            name (str): 信息类别，如 'plate'、'page_size'
+            key (str): 条目键，如机构ID、接口地址
+        
+        Returns:
+            不存在时返回None
+        """
+        self._import_legacy_meta(name)
+        row = self._meta_connect().execute(
+            "SELECT value FROM meta WHERE name = ? AND key = ?", (name, str(key))
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def save_meta(self, name, key, value):
+        """写入一条全局信息，只更新这一行"""
+        self._import_legacy_meta(name)
+        conn = self._meta_connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (name, key, value, updated_at) VALUES (?, ?, ?, ?)",
+            (name, str(key), json.dumps(value, ensure_ascii=False), time.time())
+        )
+        conn.commit()
+    
+    def iter_entries(self, with_path=False):
+        """
+        遍历缓存根目录及所有股票目录下的缓存，用于迁移
+        
+        Args:
+            with_path (bool): 是否同时返回缓存文件路径
+        
+        Yields:
+            tuple: (scope, kind, key, data)，with_path为True时末尾再加文件路径
+        """
+        for scope, kind, key, path in self._walk():
+            try:
+                data = self._read(kind, path)
+            except Exception as e:
+                print(f"读取缓存文件失败，跳过: {path} ({e})")
+                continue
+            yield (scope, kind, key, data, path) if with_path else (scope, kind, key, data)
+    
+    def entries(self):
+        """
+        列出所有缓存条目的大小和时间，不读取内容
+        
+        Yields:
+            dict: {'kind', 'key', 'size', 'saved_at', 'accessed_at', 'ref'}，ref用于remove
+        """
+        for _, kind, key, path in self._walk():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            yield {
+                'kind': kind, 'key': key, 'size': stat.st_size,
+                'saved_at': stat.st_mtime, 'accessed_at': max(stat.st_atime, stat.st_mtime), 'ref': path
+            }
+    
+    def remove(self, ref):
+        """删除entries列出的一条缓存"""
+        try:
+            os.remove(ref)
+        except FileNotFoundError:
+            pass
+    
+    def vacuum(self):
+        """文件缓存删除后即释放空间，无需整理"""
+    
+    def _walk(self):
+        """
+        遍历所有缓存文件
+        
+        Yields:
+            tuple: (scope, kind, key, 文件路径)
+        """
+        for scope in self._scopes():
+            scope_dir = os.path.join(self.base_dir, scope) if scope else self.base_dir
+            for kind, dir_name in CACHE_KINDS.items():
+                kind_dir = os.path.join(scope_dir, dir_name)
+                if not os.path.isdir(kind_dir):
+                    continue
+                for root, _, files in os.walk(kind_dir):
+                    for filename in files:
+                        category_value = os.path.basename(root) if root != kind_dir else None
+                        name = filename
+                        for suffix in COMPRESSIONS.values():
+                            if suffix and name.endswith(suffix):
+                                name = name[:-len(suffix)]
+                        key = self._parse_filename(kind, name, category_value)
+                        if key is not None:
+                            yield scope, kind, key, os.path.join(root, filename)
+    
+    def _scopes(self):
+        """缓存根目录（''）及所有股票目录名"""
+        if not os.path.isdir(self.base_dir):
+            return []
+        with os.scandir(self.base_dir) as iterator:
+            names = [
+                entry.name for entry in iterator
+                if entry.is_dir() and entry.name not in CACHE_KINDS.values()
+            ]
+        return [''] + sorted(names)
+    
+    def _parse_filename(self, kind, filename, category_value):
+        """由缓存文件名还原缓存键，无法识别时返回None"""
+        if kind == 'top_search':
+            match = re.match(r'^(.+)_(\d+)_topSearchquery\.json$', filename)
+            return (match.group(1), match.group(2)) if match else None
+        if kind == 'stock':
+            match = re.match(r'^([^_]+)_(.+)_([^_]+)_disclosurestock\.html$', filename)
+            return match.groups() if match else None
+        suffix = '_hisAnnouncementquery.json'
+        if not filename.endswith(suffix):
+            return None
+        tokens = filename[:-len(suffix)].split('_')
+        if len(tokens) < 8:
+            return None
+        stock = f"{tokens[0]},{tokens[1]}"
+        page_pattern = re.compile(r'^(\d+)(?:p(\d+))?$')
+        if page_pattern.match(tokens[2]):
+            # 早期版本保存时页码在分类之前；分类和plate都可能含下划线，以市场代码定位两者的分界
+            page_index = 2
+            column_index = next((i for i in range(4, len(tokens) - 3) if tokens[i] in LEGACY_COLUMNS), len(tokens) - 4)
+            category = '_'.join(tokens[3:column_index])
+            rest = tokens[column_index:]
+        else:
+            page_index = next((i for i in range(3, len(tokens)) if page_pattern.match(tokens[i])), None)
+            if page_index is None:
+                return None
+            category = '_'.join(tokens[2:page_index])
+            rest = tokens[page_index + 1:]
+        if len(rest) < 4:
+            return None
+        column, plate = rest[0], ';'.join(rest[1:-2])
+        searchkey = '' if rest[-2] == 'empty' else rest[-2]
+        se_date = '' if rest[-1] == 'empty' else re.sub(r'(\d{4})(\d{2})(\d{2})', r'\1-\2-\3', rest[-1])
+        page_num, page_size = page_pattern.match(tokens[page_index]).groups()
+        key = (stock, category, page_num, column, plate, searchkey, se_date, category_value)
+        return key + (page_size,) if page_size else key
+
+class SqliteCacheBackend:
+    """
+    SQLite缓存后端
+    
+    所有股票的缓存保存在缓存根目录下的单个数据库文件中，使用WAL模式，
+    以规范化后的查询参数元组作为键。多线程各自持有连接，多进程可同时读写。
+    压缩的缓存以BLOB保存，未压缩的以JSON文本保存。
+    """
+    
+    FILENAME = "cache.sqlite3"
+    
+    def __init__(self, base_dir, compression='none'):
+        """
+        Args:
+            base_dir (str): 缓存根目录
+            compression (str): 写入时的压缩方式，'none'、'gzip' 或 'zstd'；读取时自动识别
+        """
+        os.makedirs(base_dir, exist_ok=True)
+        self.base_dir = base_dir
+        self.compression = resolve_compression(compression)
+        self.cache_dir = base_dir
+        self.db_path = os.path.join(base_dir, self.FILENAME)
+        self.scope = ''
+        self._local = threading.local()
+        self._connect()
+    
+    def _connect(self):
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "kind TEXT NOT NULL, key TEXT NOT NULL, scope TEXT NOT NULL, "
+                "data TEXT NOT NULL, updated_at REAL NOT NULL, accessed_at REAL, "
+                "PRIMARY KEY (kind, key))"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(cache)")]
+            if 'accessed_at' not in columns:
+                # 早期版本没有记录最近访问时间；批量模式下其他进程可能已经同时加上
+                try:
+                    conn.execute("ALTER TABLE cache ADD COLUMN accessed_at REAL")
+                except sqlite3.OperationalError as e:
+                    if 'duplicate column' not in str(e):
+                        raise
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_scope ON cache (scope, kind)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+    
+    def set_scope(self, scope):
+        """
+        设置当前股票，用于按股票清理和统计
+        
+        Args:
+            scope (str): 股票目录名（{股票代码}_{股票名称}），空字符串表示全部
+        """
+        self.scope = scope
+    
+    def _key(self, key):
+        """把缓存键元组序列化为字符串"""
+        return json.dumps([str(item) if item is not None else '' for item in key], ensure_ascii=False)
+    
+    def label(self, kind, key):
+        """缓存条目在日志中显示的名称"""
+        return f"{kind}:{'|'.join(str(item) for item in key if item)}"
+    
+    def load(self, kind, key):
+        """
+        读取缓存
+        
+        Returns:
+            缓存数据，不存在时返回None
+        """
+        return self.load_entry(kind, key)[0]
+    
+    def load_entry(self, kind, key):
+        """
+        读取缓存及其写入时间，并记录访问时间（供按最近使用淘汰）
+        
+        访问时间距上次记录超过ACCESS_UPDATE_INTERVAL时才更新，多数命中只读不写，
+        批量模式下多个进程读缓存时不必排队等待数据库的写锁。
+        
+        Returns:
+            tuple: (缓存数据, 写入时间戳)，不存在时返回 (None, None)
+        """
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT rowid, data, updated_at, accessed_at FROM cache WHERE kind = ? AND key = ?", (kind, self._key(key))
+        ).fetchone()
+        if row is None:
+            return None, None
+        now = time.time()
+        if now - max(row[3] or 0, row[2]) > ACCESS_UPDATE_INTERVAL:
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE rowid = ?", (now, row[0]))
+            conn.commit()
+        return decode_data(row[1]), row[2]
+    
+    def save(self, kind, key, data, scope=None):
+        """写入缓存（只保留所需字段，按设定的方式压缩）"""
+        encoded = encode_data(compact_data(kind, data), self.compression)
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (kind, key, scope, data, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (kind, self._key(key), self.scope if scope is None else scope,
+             encoded.decode('utf-8') if self.compression == 'none' else encoded, time.time())
+        )
+        conn.commit()
+    
+    def clear(self, kind):
+        """清理指定类型的缓存；设置了股票时只清理该股票的缓存"""
+        conn = self._connect()
+        if self.scope:
+            conn.execute("DELETE FROM cache WHERE kind = ? AND scope = ?", (kind, self.scope))
+        else:
+            conn.execute("DELETE FROM cache WHERE kind = ?", (kind,))
+        conn.commit()
+    
+    def count(self, kind):
+        """指定类型的缓存数量；设置了股票时只统计该股票"""
+        if self.scope:
+            row = self._connect().execute(
+                "SELECT COUNT(*) FROM cache WHERE kind = ? AND scope = ?", (kind, self.scope)
+            ).fetchone()
+        else:
+            row = self._connect().execute("SELECT COUNT(*) FROM cache WHERE kind = ?", (kind,)).fetchone()
+        return row[0]
+    
+    def stats(self, workers=None):
+        """
+        统计每只股票每类缓存的条数、字节数和写入时间范围
+        
+        Args:
+            workers: 不使用，与文件后端保持相同的参数
+        
+        Returns:
+            list: [{'scope', 'kind', 'count', 'size', 'oldest', 'newest'}]，按股票和类型排序
+        """
+        rows = self._connect().execute(
+            "SELECT scope, kind, COUNT(*), SUM(LENGTH(data) + LENGTH(key)), MIN(updated_at), MAX(updated_at) "
+            "FROM cache WHERE kind != 'meta' GROUP BY scope, kind ORDER BY scope, kind"
+        ).fetchall()
+        return [
+            {'scope': scope, 'kind': kind, 'count': count, 'size': size or 0, 'oldest': oldest, 'newest': newest}
+            for scope, kind, count, size, oldest, newest in rows
+        ]
+    
+    def iter_entries(self):
+        """
+        遍历所有缓存
+        
+        只遍历开始时已有的记录，遍历过程中重新写入的缓存不会被再次遍历。
+        
+        Yields:
+            tuple: (scope, kind, key, data)
+        """
+        conn = self._connect()
+        last_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM cache").fetchone()[0]
+        rows = conn.execute("SELECT scope, kind, key, data FROM cache WHERE rowid <= ? ORDER BY rowid", (last_rowid,))
+        for scope, kind, key, data in rows:
+            yield scope, kind, tuple(json.loads(key)), decode_data(data)
+    
+    def entries(self):
+        """
+        列出所有缓存条目的大小和时间，不读取内容
+        
+        Yields:
+            dict: {'kind', 'key', 'size', 'saved_at', 'accessed_at', 'ref'}，ref用于remove
+        """
+        rows = self._connect().execute(
+            "SELECT rowid, kind, key, LENGTH(data) + LENGTH(key), updated_at, COALESCE(accessed_at, updated_at) "
+            "FROM cache WHERE kind != 'meta'"
+        ).fetchall()
+        for rowid, kind, key, size, saved_at, accessed_at in rows:
+            yield {
+                'kind': kind, 'key': tuple(json.loads(key)), 'size': size,
+                'saved_at': saved_at, 'accessed_at': accessed_at, 'ref': rowid
+            }
+    
+    def remove(self, ref):
+        """删除entries列出的一条缓存"""
+        conn = self._connect()
+        conn.execute("DELETE FROM cache WHERE rowid = ?", (ref,))
+        conn.commit()
+    
+    def vacuum(self):
+        """整理数据库文件，释放已删除或缩小的缓存占用的空间"""
+        conn = self._connect()
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    
+    def load_meta(self, name, key):
+        """
+        读取一条全局信息（如某个接口的每页条数）
+        
+        Args:
+            name (str): 信息类别，如 'plate'、'page_size'
+            key (str): 条目键，如机构ID、接口地址
+        
+        Returns:
+            不存在时返回None
+        """
+        value = self.load('meta', (name, key))
+        if value is None:
+            # 早期版本把同一类别的全局信息保存在一行中
+            value = (self.load('meta', (name,)) or {}).get(key)
+        return value
+    
+    def save_meta(self, name, key, value):
+        """写入一条全局信息，只更新这一行"""
+        self.save('meta', (name, key), value, scope='')
+
+def create_cache_backend(name, base_dir, compression='none'):
+    """
+    按名称创建缓存后端
+    
+    Args:
+        name (str): 'file' 或 'sqlite'
+        base_dir (str): 缓存根目录
+        compression (str): 写入时的压缩方式，'none'、'gzip' 或 'zstd'
+    
+    Returns:
+        FileCacheBackend|SqliteCacheBackend: 缓存后端
+    """
+    if name == 'sqlite':
+        return SqliteCacheBackend(base_dir, compression)
+    if name != 'file':
+        print(f"未知的缓存后端: {name}，使用文件缓存")
+    return FileCacheBackend(base_dir, compression)
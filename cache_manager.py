@@ -1,38 +1,106 @@
 """
 缓存管理模块 - 负责缓存文件的保存、读取和检查
 """
-import os
 import json
-import hashlib
-from pathlib import Path
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from cache_backends import create_cache_backend, compact_data
+
+# 各类型缓存键的字段顺序，所有读写都按此构造缓存键
+CACHE_KEY_FIELDS = {
+    'top_search': ('key_word', 'max_num'),
+    'stock': ('stock_code', 'org_id', 'sjsts_bond'),
+    'announcement': ('stock', 'category', 'page_num', 'column', 'plate', 'searchkey', 'se_date', 'category_value'),
+}
+DEFAULT_PAGE_SIZE = 30
+# 公告列表第1页单独设置有效期：有新公告时第1页最先变化
+FIRST_PAGE = 'first_page'
+
+def parse_ttls(spec):
+    """
+    解析各类型缓存的有效期
+    
+    Args:
+        spec (str): 形如 "first_page=12,announcement=720,top_search=720,stock=24"，单位为小时
+    
+    Returns:
+        dict: 类型 -> 有效期（秒），0表示永久有效
+    """
+    ttls = {}
+    for item in (spec or '').split(','):
+        name, _, hours = item.partition('=')
+        if name.strip() and hours.strip():
+            try:
+                ttls[name.strip()] = float(hours) * 3600
+            except ValueError:
+                print(f"无法解析缓存有效期: {item}")
+    return ttls
+
+def build_cache_key(kind, page_size=DEFAULT_PAGE_SIZE, **params):
+    """
+    构造规范化的缓存键
+    
+    按CACHE_KEY_FIELDS中的顺序取参数，各字段统一为去掉首尾空白的字符串（None为空字符串），
+    保证保存和读取时得到同一个键。
+    
+    Args:
+        kind (str): 缓存类型
+        page_size (int): 公告查询的每页条数，每页30条时与早期版本的缓存键相同
+        **params: 缓存键字段
+    
+    Returns:
+        tuple: 缓存键
+    """
+    key = tuple('' if params[field] is None else str(params[field]).strip() for field in CACHE_KEY_FIELDS[kind])
+    if kind == 'announcement' and int(page_size) != DEFAULT_PAGE_SIZE:
+        key += (str(int(page_size)),)
+    return key
 
 class CacheManager:
-    """缓存管理类"""
+    """
+    缓存管理类
     
-    def __init__(self, cache_dir="cache", stock_code=None, stock_name=None):
-        self.base_dir = cache_dir
-        self.stock_code = stock_code
-        self.stock_name = stock_name
-        self.cache_dir = self.base_dir
-        if stock_code and stock_name:
-            self.cache_dir = os.path.join(self.base_dir, f"{stock_code}_{stock_name}")
-        self.top_search_dir = os.path.join(self.cache_dir, "topSearchquery")
-        self.stock_dir = os.path.join(self.cache_dir, "stock")
-        self.announcement_dir = os.path.join(self.cache_dir, "hisAnnouncementquery")
-        
-        # 创建缓存目录
-        self._create_cache_dirs()
+    磁盘缓存之前有一层进程内的LRU内存缓存，按占用字节数淘汰，
+    同一进程内重复读取的公告页不再访问磁盘。
     
-    def _create_cache_dirs(self):
-        """创建缓存目录结构"""
-        os.makedirs(self.cache_dir, exist_ok=True)
-        os.makedirs(self.top_search_dir, exist_ok=True)
-        os.makedirs(self.stock_dir, exist_ok=True)
-        os.makedirs(self.announcement_dir, exist_ok=True)
+    每类缓存有各自的有效期：过期后在宽限期内仍先返回旧数据，同时在后台重新请求
+    （stale-while-revalidate）；超过宽限期则视为不存在。
+    """
     
-    def _get_cache_path(self, directory, filename):
-        """获取缓存文件路径"""
-        return os.path.join(directory, filename)
+    def __init__(self, cache_dir="cache", stock_code=None, stock_name=None, backend="file", compression="none",
+                 memory_limit=64 * 1024 * 1024, ttls=None, stale_seconds=0):
+        """
+        Args:
+            cache_dir (str): 缓存根目录
+            stock_code (str): 股票代码
+            stock_name (str): 股票名称
+            backend (str): 缓存后端，'file'（每条缓存一个文件）或 'sqlite'（单个数据库文件）
+            compression (str): 缓存压缩方式，'none'、'gzip' 或 'zstd'
+            memory_limit (int): 内存缓存的字节数上限，0表示不使用内存缓存
+            ttls (dict): 类型（top_search、stock、first_page、announcement）-> 有效期秒数，未设置或0表示永久有效
+            stale_seconds (float): 过期后仍可返回旧数据并在后台刷新的宽限期（秒）
+        """
+        self.base_dir = cache_dir
+        self.backend = create_cache_backend(backend, cache_dir, compression)
+        self.stock_code = None
+        self.stock_name = None
+        self.cache_dir = self.backend.cache_dir
+        self.ttls = dict(ttls or {})
+        self.stale_seconds = max(0, stale_seconds)
+        # 后台刷新：正在刷新的缓存及线程池（首次需要时创建）
+        self._revalidating = set()
+        self._revalidator = None
+        # (作用域, 类型, 缓存键) -> (数据, 估算字节数, 写入时间)，按最近使用排序
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        self.memory_limit = max(0, int(memory_limit))
+        self._memory_lock = threading.Lock()
+        self.stats = {}
+        self.reset_stats()
+        if stock_code and stock_name:
+            self.set_stock(stock_code, stock_name)
     
     def save_top_search_cache(self, key_word, max_num, data):
         """
@@ -43,13 +111,10 @@ class CacheManager:
             max_num (int): 最大返回数量
             data (dict): 响应数据
         """
-        filename = f"{key_word}_{max_num}_topSearchquery.json"
-        cache_path = self._get_cache_path(self.top_search_dir, filename)
-        
+        key = build_cache_key('top_search', key_word=key_word, max_num=max_num)
         try:
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            print(f"股票搜索缓存已保存: {filename}")
+            self._save('top_search', key, data)
+            print(f"股票搜索缓存已保存: {self.backend.label('top_search', key)}")
         except Exception as e:
             print(f"保存股票搜索缓存失败: {e}")
     
@@ -60,71 +125,75 @@ class CacheManager:
         Args:
             key_word (str): 股票代码
             max_num (int): 最大返回数量
-            
+        
         Returns:
             dict: 缓存数据，如果不存在返回None
         """
-        filename = f"{key_word}_{max_num}_topSearchquery.json"
-        cache_path = self._get_cache_path(self.top_search_dir, filename)
-        
-        if os.path.exists(cache_path):
-            try:
-                with open(cache_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                print(f"使用股票搜索缓存: {filename}")
+        key = build_cache_key('top_search', key_word=key_word, max_num=max_num)
+        try:
+            data = self._load('top_search', key)
+            if data is not None:
+                print(f"使用股票搜索缓存: {self.backend.label('top_search', key)}")
                 return data
-            except Exception as e:
-                print(f"加载股票搜索缓存失败: {e}")
+        except Exception as e:
+            print(f"加载股票搜索缓存失败: {e}")
         
         return None
     
-    def save_stock_cache(self, stock_code, org_id, sjsts_bond, html_content):
+    def load_stock_cache(self, stock_code, org_id, sjsts_bond):
         """
-        保存股票页面缓存
+        加载早期版本的股票页面缓存（现在只缓存板块代码）
         
         Args:
             stock_code (str): 股票代码
             org_id (str): 机构ID
             sjsts_bond (str): 是否可转债
-            html_content (str): HTML内容
-        """
-        filename = f"{stock_code}_{org_id}_{sjsts_bond}_disclosurestock.html"
-        cache_path = self._get_cache_path(self.stock_dir, filename)
         
+        Returns:
+            str: HTML内容，如果不存在返回None
+        """
+        key = build_cache_key('stock', stock_code=stock_code, org_id=org_id, sjsts_bond=sjsts_bond)
         try:
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-            print(f"股票页面缓存已保存: {filename}")
+            content = self._load('stock', key)
+            if content is not None:
+                print(f"使用股票页面缓存: {self.backend.label('stock', key)}")
+                return content
         except Exception as e:
-            print(f"保存股票页面缓存失败: {e}")
+            print(f"加载股票页面缓存失败: {e}")
+        
+        return None
     
-    def load_stock_cache(self, stock_code, org_id, sjsts_bond):
+    def load_plate_cache(self, org_id):
         """
-        加载股票页面缓存
+        加载板块缓存
         
         Args:
-            stock_code (str): 股票代码
             org_id (str): 机构ID
-            sjsts_bond (str): 是否可转债
-            
+        
         Returns:
-            str: HTML内容，如果不存在返回None
+            str: 板块代码，如果不存在返回None
         """
-        filename = f"{stock_code}_{org_id}_{sjsts_bond}_disclosurestock.html"
-        cache_path = self._get_cache_path(self.stock_dir, filename)
-        
-        if os.path.exists(cache_path):
-            try:
-                with open(cache_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                print(f"使用股票页面缓存: {filename}")
-                return content
-            except Exception as e:
-                print(f"加载股票页面缓存失败: {e}")
+        try:
+            return self.backend.load_meta('plate', org_id)
+        except Exception as e:
+            print(f"加载板块缓存失败: {e}")
+            return None
+    
+    def save_plate_cache(self, org_id, plate):
+        """
+        保存板块缓存
         
-        return None
+        Args:
+            org_id (str): 机构ID
+            plate (str): 板块代码
+        """
+        try:
+            self.backend.save_meta('plate', org_id, plate)
+            print(f"板块缓存已保存: {org_id} -> {plate}")
+        except Exception as e:
+            print(f"保存板块缓存失败: {e}")
     
-    def save_announcement_cache(self, stock, page_num, category, column, plate, searchkey, se_date, data, category_value=None):
+    def save_announcement_cache(self, stock, page_num, category, column, plate, searchkey, se_date, data, category_value=None, page_size=30):
         """
         保存公告查询缓存
         
@@ -138,29 +207,16 @@ class CacheManager:
             se_date (str): 日期
             data (dict): 响应数据
             category_value (str): 分类中文名
+            page_size (int): 每页条数
         """
-        # 清理参数中的特殊字符
-        safe_stock = stock.replace(',', '_')
-        safe_category = category.replace(';', '_')
-        safe_plate = plate.replace(';', '_')
-        safe_searchkey = searchkey.replace(' ', '_') if searchkey else 'empty'
-        safe_se_date = se_date.replace('-', '') if se_date else 'empty'
-        safe_category_value = category_value or 'unknown'
-        safe_category_value = safe_category_value.replace('/', '_').replace('\\', '_')
-        
-        dir_path = os.path.join(self.announcement_dir, safe_category_value)
-        os.makedirs(dir_path, exist_ok=True)
-        filename = f"{safe_stock}_{page_num}_{safe_category}_{column}_{safe_plate}_{safe_searchkey}_{safe_se_date}_hisAnnouncementquery.json"
-        cache_path = self._get_cache_path(dir_path, filename)
-        
+        key = self._announcement_key(stock, page_num, category, column, plate, searchkey, se_date, category_value, page_size)
         try:
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            print(f"公告查询缓存已保存: {os.path.join(safe_category_value, filename)}")
+            self._save('announcement', key, data)
+            print(f"公告查询缓存已保存: {self.backend.label('announcement', key)}")
         except Exception as e:
             print(f"保存公告查询缓存失败: {e}")
     
-    def load_announcement_cache(self, stock, page_num, category, column, plate, searchkey, se_date, category_value=None):
+    def load_announcement_cache(self, stock, page_num, category, column, plate, searchkey, se_date, category_value=None, page_size=30, revalidate=None):
         """
         加载公告查询缓存
         
@@ -173,32 +229,216 @@ class CacheManager:
             searchkey (str): 搜索关键词
             se_date (str): 日期
             category_value (str): 分类中文名
+            page_size (int): 每页条数
+            revalidate (callable): 重新请求并保存这一页的函数，缓存过期但在宽限期内时在后台调用
         Returns:
             dict: 缓存数据，如果不存在返回None
         """
-        # 清理参数中的特殊字符
-        safe_stock = stock.replace(',', '_')
-        safe_category = category.replace(';', '_')
-        safe_plate = plate.replace(';', '_')
-        safe_searchkey = searchkey.replace(' ', '_') if searchkey else 'empty'
-        safe_se_date = se_date.replace('-', '') if se_date else 'empty'
-        safe_category_value = category_value or 'unknown'
-        safe_category_value = safe_category_value.replace('/', '_').replace('\\', '_')
+        key = self._announcement_key(stock, page_num, category, column, plate, searchkey, se_date, category_value, page_size)
+        try:
+            data = self._load('announcement', key, revalidate)
+            if data is not None:
+                print(f"使用公告查询缓存: {self.backend.label('announcement', key)}")
+                return data
+        except Exception as e:
+            print(f"加载公告查询缓存失败: {e}")
+        
+        return None
+    
+    def _announcement_key(self, stock, page_num, category, column, plate, searchkey, se_date, category_value, page_size):
+        """公告查询缓存键"""
+        return build_cache_key(
+            'announcement', page_size,
+            stock=stock, category=category, page_num=page_num, column=column, plate=plate,
+            searchkey=searchkey, se_date=se_date, category_value=category_value
+        )
+    
+    def ttl_type(self, kind, key):
+        """缓存条目对应的有效期类型，公告列表第1页单独计算"""
+        if kind == 'announcement' and len(key) > 2 and str(key[2]) == '1':
+            return FIRST_PAGE
+        return kind
+    
+    def _freshness(self, kind, key, saved_at):
+        """
+        判断缓存是否过期
+        
+        Returns:
+            str: 'fresh'（有效）、'stale'（已过期但在宽限期内）或 'expired'（超过宽限期）
+        """
+        ttl = self.ttls.get(self.ttl_type(kind, key), 0)
+        if not ttl or saved_at is None:
+            return 'fresh'
+        age = time.time() - saved_at
+        if age <= ttl:
+            return 'fresh'
+        return 'stale' if age <= ttl + self.stale_seconds else 'expired'
+    
+    def _load(self, kind, key, revalidate=None):
+        """
+        读取缓存：先查内存，再查磁盘，磁盘命中的数据放入内存
+        
+        Args:
+            revalidate (callable): 重新请求并保存缓存的函数；缓存已过期但在宽限期内时返回旧数据并在后台调用，
+                None表示过期即视为不存在
         
-        dir_path = os.path.join(self.announcement_dir, safe_category_value)
-        filename = f"{safe_stock}_{safe_category}_{page_num}_{column}_{safe_plate}_{safe_searchkey}_{safe_se_date}_hisAnnouncementquery.json"
-        cache_path = self._get_cache_path(dir_path, filename)
+        Returns:
+            缓存数据，不存在或已过期时返回None
+        """
+        memory_key = (self.backend.scope, kind, key)
+        with self._memory_lock:
+            entry = self.memory.get(memory_key)
+            if entry is not None:
+                self.memory.move_to_end(memory_key)
+        if entry is not None:
+            data, _, saved_at = entry
+            source = 'memory_hits'
+        else:
+            data, saved_at = self.backend.load_entry(kind, key)
+            source = 'disk_hits'
+            if data is not None:
+                self._remember(memory_key, data, saved_at)
+        if data is None:
+            with self._memory_lock:
+                self.stats['misses'] += 1
+            return None
+        
+        freshness = self._freshness(kind, key, saved_at)
+        if freshness == 'stale' and revalidate is not None:
+            self._revalidate(memory_key, revalidate)
+        elif freshness != 'fresh':
+            with self._memory_lock:
+                self.stats['expired'] += 1
+            return None
+        with self._memory_lock:
+            self.stats[source] += 1
+            if freshness == 'stale':
+                self.stats['stale_hits'] += 1
+        return data
+    
+    def _revalidate(self, memory_key, revalidate):
+        """在后台重新请求过期的缓存，同一条缓存同时只刷新一次"""
+        with self._memory_lock:
+            if memory_key in self._revalidating:
+                return
+            self._revalidating.add(memory_key)
+            if self._revalidator is None:
+                self._revalidator = ThreadPoolExecutor(max_workers=2)
         
-        if os.path.exists(cache_path):
+        def run():
             try:
-                with open(cache_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                print(f"使用公告查询缓存: {os.path.join(safe_category_value, filename)}")
-                return data
+                revalidate()
             except Exception as e:
-                print(f"加载公告查询缓存失败: {e}")
+                print(f"后台刷新缓存失败: {e}")
+            finally:
+                with self._memory_lock:
+                    self._revalidating.discard(memory_key)
         
-        return None
+        self._revalidator.submit(run)
+    
+    def wait_revalidations(self):
+        """等待后台刷新完成"""
+        with self._memory_lock:
+            revalidator, self._revalidator = self._revalidator, None
+        if revalidator is not None:
+            revalidator.shutdown(wait=True)
+    
+    def _save(self, kind, key, data):
+        """写入磁盘缓存，并放入内存（与磁盘上一样只保留所需字段）"""
+        self.backend.save(kind, key, data)
+        self._remember((self.backend.scope, kind, key), compact_data(kind, data), time.time())
+    
+    def _remember(self, memory_key, data, saved_at):
+        """放入内存缓存，超过字节数上限时淘汰最久未使用的条目"""
+        if not self.memory_limit:
+            return
+        size = len(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        if size > self.memory_limit:
+            return
+        with self._memory_lock:
+            old = self.memory.pop(memory_key, None)
+            if old is not None:
+                self.memory_size -= old[1]
+            self.memory[memory_key] = (data, size, saved_at)
+            self.memory_size += size
+            while self.memory_size > self.memory_limit:
+                _, (_, evicted_size, _) = self.memory.popitem(last=False)
+                self.memory_size -= evicted_size
+                self.stats['evictions'] += 1
+    
+    def gc(self, max_bytes=0):
+        """
+        清理磁盘缓存：删除超过有效期和宽限期的缓存；总大小超过上限时按最近使用时间从旧到新删除
+        
+        Args:
+            max_bytes (int): 缓存总字节数上限，0表示不限
+        
+        Returns:
+            dict: {'expired': 过期删除数, 'evicted': 超出上限删除数, 'kept': 保留数, 'size': 清理后字节数}
+        """
+        kept = []
+        expired = 0
+        for entry in self.backend.entries():
+            if self._freshness(entry['kind'], entry['key'], entry['saved_at']) == 'expired':
+                self.backend.remove(entry['ref'])
+                expired += 1
+            else:
+                kept.append(entry)
+        
+        total = sum(entry['size'] for entry in kept)
+        evicted = 0
+        if max_bytes and total > max_bytes:
+            kept.sort(key=lambda entry: entry['accessed_at'])
+            while kept and total > max_bytes:
+                entry = kept.pop(0)
+                self.backend.remove(entry['ref'])
+                total -= entry['size']
+                evicted += 1
+        if expired or evicted:
+            self.backend.vacuum()
+            with self._memory_lock:
+                self.memory.clear()
+                self.memory_size = 0
+        return {'expired': expired, 'evicted': evicted, 'kept': len(kept), 'size': total}
+    
+    def reset_stats(self):
+        """重置缓存命中统计"""
+        with self._memory_lock:
+            self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'stale_hits': 0, 'expired': 0}
+    
+    def get_cache_stats(self):
+        """
+        获取缓存命中统计
+        
+        Returns:
+            dict: {'memory_hits', 'disk_hits', 'misses', 'evictions', 'stale_hits', 'expired',
+                'memory_entries', 'memory_size'}
+        """
+        with self._memory_lock:
+            return {**self.stats, 'memory_entries': len(self.memory), 'memory_size': self.memory_size}
+    
+    def load_page_size(self, endpoint):
+        """
+        读取接口已确认可用的每页条数
+        
+        Args:
+            endpoint (str): 接口地址
+        
+        Returns:
+            int: 每页条数，没有记录时返回None
+        """
+        try:
+            return self.backend.load_meta('page_size', endpoint)
+        except Exception as e:
+            print(f"读取每页条数记录失败: {e}")
+            return None
+    
+    def save_page_size(self, endpoint, page_size):
+        """记录接口可用的每页条数"""
+        try:
+            self.backend.save_meta('page_size', endpoint, page_size)
+        except Exception as e:
+            print(f"保存每页条数记录失败: {e}")
     
     def clear_cache(self, cache_type=None):
         """
@@ -207,38 +447,30 @@ class CacheManager:
         Args:
             cache_type (str): 缓存类型 ('top_search', 'stock', 'announcement', None表示清理所有)
         """
-        if cache_type is None or cache_type == 'top_search':
-            self._clear_directory(self.top_search_dir)
-        if cache_type is None or cache_type == 'stock':
-            self._clear_directory(self.stock_dir)
-        if cache_type is None or cache_type == 'announcement':
-            self._clear_directory(self.announcement_dir)
+        for kind in ('top_search', 'stock', 'announcement'):
+            if cache_type is None or cache_type == kind:
+                self.backend.clear(kind)
+        with self._memory_lock:
+            self.memory.clear()
+            self.memory_size = 0
         
         print("缓存清理完成")
     
-    def _clear_directory(self, directory):
-        """清理指定目录下的所有文件"""
-        if os.path.exists(directory):
-            for filename in os.listdir(directory):
-                file_path = os.path.join(directory, filename)
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
-    
     def get_cache_info(self):
         """获取缓存信息"""
         info = {
-            'top_search_count': len(os.listdir(self.top_search_dir)) if os.path.exists(self.top_search_dir) else 0,
-            'stock_count': len(os.listdir(self.stock_dir)) if os.path.exists(self.stock_dir) else 0,
-            'announcement_count': len(os.listdir(self.announcement_dir)) if os.path.exists(self.announcement_dir) else 0
+            'top_search_count': self.backend.count('top_search'),
+            'stock_count': self.backend.count('stock'),
+            'announcement_count': self.backend.count('announcement')
         }
         return info
-
+    
     def set_stock(self, stock_code, stock_name):
-        """设置股票代码和名称，重置缓存目录"""
+        """设置股票代码和名称，切换到该股票的缓存目录"""
+        # 后台刷新按当前股票目录保存缓存，切换前先等其完成
+        self.wait_revalidations()
         self.stock_code = stock_code
         self.stock_name = stock_name
-        self.cache_dir = os.path.join(self.base_dir, f"{stock_code}_{stock_name}")
-        self.top_search_dir = os.path.join(self.cache_dir, "topSearchquery")
-        self.stock_dir = os.path.join(self.cache_dir, "stock")
-        self.announcement_dir = os.path.join(self.cache_dir, "hisAnnouncementquery")
-        self._create_cache_dirs() 
\ No newline at end of file
+        scope = f"{stock_code}_{stock_name}"
+        self.backend.set_scope(scope)
+        self.cache_dir = self.backend.cache_dir
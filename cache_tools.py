@@ -1,26 +1,105 @@
 """
 缓存管理工具 - 提供缓存清理和查看功能
 """
+import os
 import sys
+import time
+import unicodedata
 from config import Config
-from cache_manager import CacheManager
+from cache_manager import CacheManager, parse_ttls
+from cache_backends import FileCacheBackend, SqliteCacheBackend, create_cache_backend, merge_stats
+from download_manifest import DownloadManifest
+from file_downloader import generate_filename, extract_date_from_url
+
+def _cache_manager():
+    """按配置创建缓存管理器"""
+    return CacheManager(
+        cache_dir=Config.CACHE_DIR,
+        backend=Config.CACHE_BACKEND,
+        compression=Config.CACHE_COMPRESSION,
+        ttls=parse_ttls(Config.CACHE_TTLS),
+        stale_seconds=Config.CACHE_STALE_HOURS * 3600
+    )
+
+KIND_NAMES = {'top_search': '股票搜索', 'stock': '股票页面', 'announcement': '公告查询'}
+
+def _format_size(size):
+    """字节数转为易读的大小"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+
+def _format_age(timestamp, now):
+    """时间戳转为距今多久"""
+    if timestamp is None:
+        return "-"
+    age = max(0, now - timestamp)
+    if age < 3600:
+        return f"{age / 60:.0f}分钟前"
+    if age < 86400:
+        return f"{age / 3600:.1f}小时前"
+    return f"{age / 86400:.1f}天前"
+
+def _pad(text, width, align='>'):
+    """
+    按显示宽度补齐空格，中文等全角字符占两列
+    
+    Args:
+        text: 要显示的内容
+        width (int): 显示宽度
+        align (str): '>' 右对齐，'<' 左对齐
+    """
+    text = str(text)
+    display_width = sum(2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1 for char in text)
+    padding = ' ' * max(0, width - display_width)
+    return text + padding if align == '<' else padding + text
+
+# 缓存信息表格各列的显示宽度：股票、股票搜索、股票页面、公告查询、大小、最早写入、最新写入
+INFO_COLUMNS = (19, 9, 9, 9, 10, 12, 12)
 
 def show_cache_info():
-    """显示缓存信息"""
-    cache_manager = CacheManager(cache_dir=Config.CACHE_DIR)
-    info = cache_manager.get_cache_info()
+    """显示缓存信息：每只股票、每类缓存的条数、大小和新旧程度"""
+    backend = create_cache_backend(Config.CACHE_BACKEND, Config.CACHE_DIR, Config.CACHE_COMPRESSION)
+    start = time.time()
+    rows = backend.stats()
+    elapsed = time.time() - start
+    now = time.time()
     
-    print("=" * 50)
-    print("缓存信息")
-    print("=" * 50)
-    print(f"股票搜索缓存: {info['top_search_count']} 个文件")
-    print(f"股票页面缓存: {info['stock_count']} 个文件")
-    print(f"公告查询缓存: {info['announcement_count']} 个文件")
-    print("=" * 50)
+    # 按股票汇总
+    stocks = {}
+    kinds = {kind: {'count': 0, 'size': 0, 'oldest': None, 'newest': None} for kind in KIND_NAMES}
+    for row in rows:
+        stock = stocks.setdefault(row['scope'] or '(根目录)', {'counts': {}, 'count': 0, 'size': 0, 'oldest': None, 'newest': None})
+        stock['counts'][row['kind']] = row['count']
+        merge_stats(stock, row)
+        if row['kind'] in kinds:
+            merge_stats(kinds[row['kind']], row)
+    
+    print("=" * 80)
+    print(f"缓存信息: {Config.CACHE_DIR} ({Config.CACHE_BACKEND})")
+    print("=" * 80)
+    header = ('股票', '股票搜索', '股票页面', '公告查询', '大小', '最早写入', '最新写入')
+    print(''.join(_pad(text, width, '<' if i == 0 else '>') for i, (text, width) in enumerate(zip(header, INFO_COLUMNS))))
+    for name, stock in stocks.items():
+        counts = stock['counts']
+        cells = (
+            name, counts.get('top_search', 0), counts.get('stock', 0), counts.get('announcement', 0),
+            _format_size(stock['size']), _format_age(stock['oldest'], now), _format_age(stock['newest'], now)
+        )
+        print(''.join(_pad(text, width, '<' if i == 0 else '>') for i, (text, width) in enumerate(zip(cells, INFO_COLUMNS))))
+    print("-" * 80)
+    for kind, total in kinds.items():
+        print(
+            f"{KIND_NAMES[kind]}缓存: {total['count']} 条, {_format_size(total['size'])}, "
+            f"最早 {_format_age(total['oldest'], now)}, 最新 {_format_age(total['newest'], now)}"
+        )
+    print(f"股票目录数: {sum(1 for name in stocks if name != '(根目录)')}，统计用时 {elapsed:.2f}秒")
+    print("=" * 80)
 
 def clear_cache(cache_type=None):
     """清理缓存"""
-    cache_manager = CacheManager(cache_dir=Config.CACHE_DIR)
+    cache_manager = _cache_manager()
     
     if cache_type is None:
         print("清理所有缓存...")
@@ -31,6 +110,115 @@ def clear_cache(cache_type=None):
     
     print("缓存清理完成")
 
+def migrate_cache():
+    """把文件缓存迁移到SQLite缓存（原文件保留，确认无误后可自行删除）"""
+    source = FileCacheBackend(Config.CACHE_DIR)
+    target = SqliteCacheBackend(Config.CACHE_DIR, Config.CACHE_COMPRESSION)
+    
+    print(f"迁移文件缓存到: {target.db_path}")
+    counts = {'top_search': 0, 'stock': 0, 'announcement': 0}
+    for scope, kind, key, data in source.iter_entries():
+        target.save(kind, key, data, scope=scope)
+        counts[kind] += 1
+    
+    print("=" * 50)
+    print(f"股票搜索缓存: {counts['top_search']} 条")
+    print(f"股票页面缓存: {counts['stock']} 条")
+    print(f"公告查询缓存: {counts['announcement']} 条")
+    print("=" * 50)
+    print("迁移完成，在.env中设置 CACHE_BACKEND=sqlite 即可使用")
+
+def gc_cache(max_mb=None):
+    """删除超过有效期和宽限期的缓存，总大小超过上限时删除最久未使用的缓存"""
+    max_mb = Config.CACHE_MAX_MB if max_mb is None else max_mb
+    cache_manager = _cache_manager()
+    before = _dir_size(Config.CACHE_DIR)
+    
+    print(f"清理缓存: {Config.CACHE_DIR}（上限: {f'{max_mb:g}MB' if max_mb else '不限'}）")
+    result = cache_manager.gc(int(max_mb * 1024 * 1024))
+    
+    print("=" * 50)
+    print(f"删除过期缓存: {result['expired']} 条")
+    print(f"删除超出上限的缓存: {result['evicted']} 条")
+    print(f"保留缓存: {result['kept']} 条")
+    print(f"缓存大小: {before / 1024 / 1024:.2f}MB -> {_dir_size(Config.CACHE_DIR) / 1024 / 1024:.2f}MB")
+    print("=" * 50)
+
+def _dir_size(path):
+    """目录下所有文件的总字节数"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass
+    return total
+
+def compact_cache():
+    """把已有缓存按当前格式重新写入：不含空白的JSON，只保留所需字段，按CACHE_COMPRESSION压缩"""
+    backend = create_cache_backend(Config.CACHE_BACKEND, Config.CACHE_DIR, Config.CACHE_COMPRESSION)
+    before = _dir_size(Config.CACHE_DIR)
+    
+    print(f"压缩缓存: {Config.CACHE_DIR}（压缩方式: {backend.compression}）")
+    counts = {'top_search': 0, 'stock': 0, 'announcement': 0}
+    legacy_removed = 0
+    if isinstance(backend, SqliteCacheBackend):
+        for scope, kind, key, data in backend.iter_entries():
+            if kind not in counts or kind == 'stock':
+                continue
+            backend.save(kind, key, data, scope=scope)
+            counts[kind] += 1
+    else:
+        for scope, kind, key, data, source in backend.iter_entries(with_path=True):
+            if kind not in counts or kind == 'stock':
+                continue
+            backend.set_scope(scope)
+            target = backend.save(kind, key, data)
+            # 早期版本文件名（页码在分类之前）改存为当前文件名后删除原文件，避免缓存翻倍
+            if os.path.abspath(source) != os.path.abspath(target) and os.path.exists(source):
+                backend.remove(source)
+                legacy_removed += 1
+            counts[kind] += 1
+    backend.vacuum()
+    after = _dir_size(Config.CACHE_DIR)
+    
+    print("=" * 50)
+    print(f"股票搜索缓存: {counts['top_search']} 条")
+    print(f"公告查询缓存: {counts['announcement']} 条")
+    if legacy_removed:
+        print(f"删除旧文件名的缓存文件: {legacy_removed} 个")
+    print(f"缓存大小: {before / 1024 / 1024:.2f}MB -> {after / 1024 / 1024:.2f}MB")
+    print("=" * 50)
+
+def manifest_command(action="info"):
+    """查看或重建下载记录"""
+    manifest = DownloadManifest(Config.DOWNLOADS_DIR)
+    
+    if action == "rebuild":
+        print(f"根据下载目录和公告查询缓存重建下载记录: {manifest.db_path}")
+        result = manifest.rebuild(
+            create_cache_backend(Config.CACHE_BACKEND, Config.CACHE_DIR, Config.CACHE_COMPRESSION),
+            lambda announcement: generate_filename(
+                announcement,
+                extract_date_from_url(announcement.get('adjunctUrl', ''))
+            )
+        )
+        print(f"已记录 {result['recorded']} 个文件，保留已有记录 {result['kept']} 个，删除文件已不存在的记录 {result['removed']} 个")
+        print(f"{result['unmatched']} 个文件没有记录，在缓存中也找不到对应公告")
+    elif action != "info":
+        print(f"未知操作: {action}")
+        print("可用操作: info, rebuild")
+        return
+    
+    print("=" * 50)
+    print("下载记录")
+    print("=" * 50)
+    print(f"记录文件: {manifest.db_path}")
+    print(f"已下载公告: {manifest.count()} 个")
+    print(f"文件总大小: {manifest.total_size() / 1024 / 1024:.1f}MB")
+    print("=" * 50)
+
 def main():
     """主函数"""
     if len(sys.argv) < 2:
@@ -40,6 +228,11 @@ def main():
         print("  python cache_tools.py clear top_search        # 清理股票搜索缓存")
         print("  python cache_tools.py clear stock             # 清理股票页面缓存")
         print("  python cache_tools.py clear announcement      # 清理公告查询缓存")
+        print("  python cache_tools.py migrate                 # 把文件缓存迁移到SQLite")
+        print("  python cache_tools.py compact                 # 按当前格式压缩已有缓存")
+        print("  python cache_tools.py gc [上限MB]             # 删除过期缓存，超过上限时删除最久未使用的缓存")
+        print("  python cache_tools.py manifest                # 查看下载记录")
+        print("  python cache_tools.py manifest rebuild        # 根据下载目录重建下载记录")
         return
     
     command = sys.argv[1]
@@ -49,9 +242,17 @@ def main():
     elif command == "clear":
         cache_type = sys.argv[2] if len(sys.argv) > 2 else None
         clear_cache(cache_type)
+    elif command == "migrate":
+        migrate_cache()
+    elif command == "compact":
+        compact_cache()
+    elif command == "gc":
+        gc_cache(float(sys.argv[2]) if len(sys.argv) > 2 else None)
+    elif command == "manifest":
+        manifest_command(sys.argv[2] if len(sys.argv) > 2 else "info")
     else:
         print(f"未知命令: {command}")
-        print("可用命令: info, clear")
+        print("可用命令: info, clear, migrate, compact, gc, manifest")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
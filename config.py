@@ -4,6 +4,9 @@
 import json
 import os
 from dotenv import load_dotenv
+from keyword_filter import KeywordFilter
+from stock_directory import StockDirectory, DEFAULT_SNAPSHOT_URLS
+from retry_policy import RetryPolicy, CircuitBreaker
 
 # 加载.env文件
 load_dotenv()
@@ -12,7 +15,37 @@ class Config:
     """全局配置类"""
     
     CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "file")
+    CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "none")
+    CACHE_MEMORY_MB = float(os.getenv("CACHE_MEMORY_MB", "64"))
+    CACHE_TTLS = os.getenv("CACHE_TTLS", "first_page=12,announcement=720,top_search=720,stock=24")
+    CACHE_STALE_HOURS = float(os.getenv("CACHE_STALE_HOURS", "24"))
+    CACHE_MAX_MB = float(os.getenv("CACHE_MAX_MB", "0"))
+    CACHE_GC_AFTER_RUN = os.getenv("CACHE_GC_AFTER_RUN", "false").lower() == "true"
     DOWNLOADS_DIR = os.getenv("DOWNLOADS_DIR", "downloads")
+    DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "3"))
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+    HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "4"))
+    PIPELINE_MODE = os.getenv("PIPELINE_MODE", "false").lower() == "true"
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+    CATEGORY_WORKERS = int(os.getenv("CATEGORY_WORKERS", "1"))
+    RATE_LIMITS = os.getenv("RATE_LIMITS", "www.cninfo.com.cn=4,static.cninfo.com.cn=3")
+    RATE_LIMIT = float(os.getenv("RATE_LIMIT", "0"))
+    HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "4"))
+    HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+    HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+    CIRCUIT_BREAKER_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_THRESHOLD", "5"))
+    CIRCUIT_BREAKER_COOLDOWN = float(os.getenv("CIRCUIT_BREAKER_COOLDOWN", "30"))
+    BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+    SERVER_SEARCH = os.getenv("SERVER_SEARCH", "true").lower() == "true"
+    DEDUPE_LINKS = os.getenv("DEDUPE_LINKS", "true").lower() == "true"
+    PAGE_PREFETCH = int(os.getenv("PAGE_PREFETCH", "4"))
+    BACKFILL_MODE = os.getenv("BACKFILL_MODE", "false").lower() == "true"
+    BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "4"))
+    BACKFILL_START_YEAR = int(os.getenv("BACKFILL_START_YEAR", "2000"))
+    STOCK_DIRECTORY = os.getenv("STOCK_DIRECTORY", os.path.join(CACHE_DIR, "stock_directory.sqlite3"))
+    STOCK_DIRECTORY_URLS = os.getenv("STOCK_DIRECTORY_URLS", DEFAULT_SNAPSHOT_URLS)
+    STOCK_DIRECTORY_REFRESH_DAYS = float(os.getenv("STOCK_DIRECTORY_REFRESH_DAYS", "7"))
     
     def __init__(self):
         self.list_search = None
@@ -70,4 +103,35 @@ class Config:
             return []
         for sep in [',', '，', ';', '；']:
             keywords = keywords.replace(sep, ',')
-        return [k.strip() for k in keywords.split(',') if k.strip()] 
\ No newline at end of file
+        return [k.strip() for k in keywords.split(',') if k.strip()] 
+    
+    @staticmethod
+    def create_retry_policy():
+        """按配置创建请求重试和熔断策略"""
+        return RetryPolicy(
+            retries=Config.HTTP_RETRIES,
+            backoff_base=Config.HTTP_BACKOFF_BASE,
+            backoff_max=Config.HTTP_BACKOFF_MAX,
+            breaker=CircuitBreaker(Config.CIRCUIT_BREAKER_THRESHOLD, Config.CIRCUIT_BREAKER_COOLDOWN)
+        )
+    
+    @staticmethod
+    def create_stock_directory():
+        """按配置创建本地股票目录"""
+        return StockDirectory(
+            Config.STOCK_DIRECTORY,
+            Config.STOCK_DIRECTORY_URLS,
+            Config.STOCK_DIRECTORY_REFRESH_DAYS
+        )
+    
+    def get_keyword_filter(self):
+        """
+        把只包含关键词、排除关键字和日期范围编译为过滤器
+        
+        关键词以 "re:" 开头时按正则表达式处理；日期范围从.env的DATE_RANGE读取，形如 2020-01-01~2024-12-31
+        """
+        return KeywordFilter(
+            self.get_include_keywords(),
+            self.get_exclude_keywords(),
+            os.getenv("DATE_RANGE", "")
+        )
\ No newline at end of file
@@ -0,0 +1,324 @@
+"""
+下载记录模块 - 以announcementId为键记录已下载文件，用于快速判断是否跳过
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+def file_sha256(file_path):
+    """
+    计算文件的SHA-256
+    
+    Args:
+        file_path (str): 文件路径
+    
+    Returns:
+        str: 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class DownloadManifest:
+    """
+    下载记录
+    
+    保存在下载根目录下的SQLite文件中（WAL模式），记录每个公告的文件路径（相对于下载根目录）、
+    附件地址、大小、SHA-256和下载时间。同一公告可能属于多个分类，因此以(公告ID, 所在目录)为主键，
+    并可按公告ID、附件地址或SHA-256找到已下载的副本。
+    判断是否跳过时先查记录，不需要重新生成文件名再访问文件系统。
+    另外按股票和分类记录已处理到的最新公告时间（高水位），供增量更新只查询新的日期区间，
+    以及运行中断时的断点（见RunCheckpoint）。
+    多线程各自持有连接，批量模式下多个进程可同时读写。
+    """
+    
+    FILENAME = "manifest.sqlite3"
+    
+    def __init__(self, downloads_dir):
+        """
+        Args:
+            downloads_dir (str): 下载根目录
+        """
+        os.makedirs(downloads_dir, exist_ok=True)
+        self.downloads_dir = downloads_dir
+        self.db_path = os.path.join(downloads_dir, self.FILENAME)
+        self._local = threading.local()
+        self._connect()
+    
+    def _connect(self):
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS downloads ("
+                "announcement_id TEXT NOT NULL, folder TEXT NOT NULL, path TEXT NOT NULL, "
+                "size INTEGER NOT NULL, sha256 TEXT, downloaded_at REAL NOT NULL, "
+                "PRIMARY KEY (announcement_id, folder))"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(downloads)")]
+            if 'adjunct_url' not in columns:
+                # 早期版本的下载记录没有附件地址
+                conn.execute("ALTER TABLE downloads ADD COLUMN adjunct_url TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_downloads_path ON downloads (path)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_downloads_adjunct_url ON downloads (adjunct_url)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_downloads_sha256 ON downloads (sha256)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks ("
+                "stock_code TEXT NOT NULL, category TEXT NOT NULL, announcement_time INTEGER NOT NULL, "
+                "updated_at REAL NOT NULL, PRIMARY KEY (stock_code, category))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "stock_code TEXT NOT NULL, category TEXT NOT NULL, state TEXT NOT NULL, "
+                "updated_at REAL NOT NULL, PRIMARY KEY (stock_code, category))"
+            )
+            conn.commit()
+            self._local.conn = conn
+        return conn
+    
+    def _relpath(self, file_path):
+        """文件路径转为相对于下载根目录的路径"""
+        return os.path.relpath(file_path, self.downloads_dir)
+    
+    def get(self, announcement_id, folder):
+        """
+        查询公告在指定目录下的下载记录
+        
+        Args:
+            announcement_id (str): 公告ID
+            folder (str): 保存目录（{下载根目录}/{股票名称}/{分类名称}）
+        
+        Returns:
+            dict: {'announcement_id', 'folder', 'path', 'size', 'sha256', 'downloaded_at'}，没有记录时返回None
+        """
+        row = self._connect().execute(
+            "SELECT * FROM downloads WHERE announcement_id = ? AND folder = ?",
+            (str(announcement_id), self._relpath(folder))
+        ).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry['path'] = os.path.join(self.downloads_dir, entry['path'])
+        return entry
+    
+    def owner_of(self, file_path):
+        """
+        查询占用该文件路径的公告ID
+        
+        Args:
+            file_path (str): 文件路径
+        
+        Returns:
+            str: 公告ID，路径未被记录时返回None
+        """
+        row = self._connect().execute(
+            "SELECT announcement_id FROM downloads WHERE path = ?", (self._relpath(file_path),)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def find_copies(self, announcement_id=None, adjunct_url=None, sha256=None):
+        """
+        查找同一公告或同一内容已下载的副本
+        
+        Args:
+            announcement_id (str): 公告ID
+            adjunct_url (str): 附件地址
+            sha256 (str): 文件摘要
+        
+        Returns:
+            list: 下载记录列表（格式同get），按下载时间从早到晚排列
+        """
+        conditions, params = [], []
+        for column, value in (('announcement_id', announcement_id), ('adjunct_url', adjunct_url), ('sha256', sha256)):
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(str(value))
+        if not conditions:
+            return []
+        rows = self._connect().execute(
+            f"SELECT * FROM downloads WHERE {' OR '.join(conditions)} ORDER BY downloaded_at", params
+        ).fetchall()
+        entries = []
+        for row in rows:
+            entry = dict(row)
+            entry['path'] = os.path.join(self.downloads_dir, entry['path'])
+            entries.append(entry)
+        return entries
+    
+    def record(self, announcement_id, file_path, sha256=None, adjunct_url=None):
+        """
+        记录已下载的文件
+        
+        Args:
+            announcement_id (str): 公告ID
+            file_path (str): 文件路径
+            sha256 (str): 文件摘要，None时自动计算
+            adjunct_url (str): 附件地址
+        """
+        size = os.path.getsize(file_path)
+        if sha256 is None:
+            sha256 = file_sha256(file_path)
+        rel_path = self._relpath(file_path)
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO downloads (announcement_id, folder, path, size, sha256, downloaded_at, adjunct_url) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (str(announcement_id), os.path.dirname(rel_path), rel_path, size, sha256, os.path.getmtime(file_path), adjunct_url)
+        )
+        conn.commit()
+    
+    def clear(self):
+        """清空下载记录"""
+        conn = self._connect()
+        conn.execute("DELETE FROM downloads")
+        conn.commit()
+    
+    def count(self):
+        """下载记录数量"""
+        return self._connect().execute("SELECT COUNT(*) FROM downloads").fetchone()[0]
+    
+    def total_size(self):
+        """已记录文件的总字节数"""
+        return self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM downloads").fetchone()[0]
+    
+    def get_watermark(self, stock_code, category):
+        """
+        查询分类的高水位
+        
+        Args:
+            stock_code (str): 股票代码
+            category (str): 分类key
+        
+        Returns:
+            int: 已处理到的最新公告时间（毫秒时间戳），没有记录时返回None
+        """
+        row = self._connect().execute(
+            "SELECT announcement_time FROM watermarks WHERE stock_code = ? AND category = ?",
+            (stock_code, category)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def set_watermark(self, stock_code, category, announcement_time):
+        """
+        推进分类的高水位，只会增大不会回退
+        
+        Args:
+            stock_code (str): 股票代码
+            category (str): 分类key
+            announcement_time (int): 公告时间（毫秒时间戳）
+        """
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO watermarks (stock_code, category, announcement_time, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (stock_code, category) DO UPDATE SET "
+            "announcement_time = MAX(announcement_time, excluded.announcement_time), updated_at = excluded.updated_at",
+            (stock_code, category, int(announcement_time), time.time())
+        )
+        conn.commit()
+    
+    def get_checkpoints(self, stock_code):
+        """
+        查询股票的运行断点
+        
+        Args:
+            stock_code (str): 股票代码
+        
+        Returns:
+            dict: 分类名 -> 断点状态
+        """
+        rows = self._connect().execute(
+            "SELECT category, state FROM checkpoints WHERE stock_code = ?", (stock_code,)
+        ).fetchall()
+        return {row['category']: json.loads(row['state']) for row in rows}
+    
+    def save_checkpoint(self, stock_code, category, state):
+        """
+        保存分类的运行断点
+        
+        Args:
+            stock_code (str): 股票代码
+            category (str): 分类名
+            state (dict): 断点状态
+        """
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO checkpoints (stock_code, category, state, updated_at) VALUES (?, ?, ?, ?)",
+            (stock_code, category, json.dumps(state, ensure_ascii=False, separators=(',', ':')), time.time())
+        )
+        conn.commit()
+    
+    def clear_checkpoints(self, stock_code):
+        """删除股票的运行断点"""
+        conn = self._connect()
+        conn.execute("DELETE FROM checkpoints WHERE stock_code = ?", (stock_code,))
+        conn.commit()
+    
+    def rebuild(self, cache_backend, filename_func):
+        """
+        根据下载目录中的现有文件和公告查询缓存重建下载记录
+        
+        文件名中不含公告ID，因此用缓存中的公告列表按下载时的规则重新生成文件名，
+        与下载目录中的文件逐一对应，匹配到的写入或更新记录。增量更新不使用缓存，
+        其下载的文件在缓存中可能没有对应公告，因此文件仍存在的已有记录保留，只删除文件已不存在的记录。
+        
+        Args:
+            cache_backend: 缓存后端（需支持iter_entries）
+            filename_func (callable): 参数为公告，返回文件名
+        
+        Returns:
+            dict: {'recorded': 本次匹配记录数, 'kept': 保留的已有记录数, 'removed': 文件已不存在而删除的记录数,
+                  'unmatched': 既无记录也找不到对应公告的文件数}
+        """
+        # 下载目录中现有的PDF文件（相对路径）
+        existing = set()
+        for root, _, files in os.walk(self.downloads_dir):
+            for filename in files:
+                if filename.lower().endswith('.pdf'):
+                    existing.add(self._relpath(os.path.join(root, filename)))
+        
+        conn = self._connect()
+        recorded = {row[0]: row[1] for row in conn.execute("SELECT path, announcement_id FROM downloads")}
+        stale = [path for path in recorded if path not in existing]
+        conn.executemany("DELETE FROM downloads WHERE path = ?", [(path,) for path in stale])
+        conn.commit()
+        matched = set()
+        start = time.time()
+        for scope, kind, key, data in cache_backend.iter_entries():
+            if kind != 'announcement' or not isinstance(data, dict):
+                continue
+            # 缓存作用域为 {股票代码}_{股票名称}，下载目录为 {股票名称}/{分类中文名}
+            stock_name = scope.split('_', 1)[1] if '_' in scope else ''
+            category_name = key[7]
+            if not stock_name or not category_name:
+                continue
+            for announcement in data.get('announcements') or []:
+                announcement_id = announcement.get('announcementId')
+                if not announcement_id:
+                    continue
+                filename = filename_func(announcement)
+                for name in (filename, f"{filename[:-4]}_{announcement_id}.pdf"):
+                    rel_path = os.path.join(stock_name, category_name, name)
+                    if rel_path in existing and rel_path not in matched:
+                        self.record(
+                            announcement_id,
+                            os.path.join(self.downloads_dir, rel_path),
+                            adjunct_url=announcement.get('adjunctUrl')
+                        )
+                        matched.add(rel_path)
+                        break
+        
+        kept = set(recorded) - set(stale) - matched
+        print(f"下载记录重建完成，用时{time.time() - start:.1f}秒")
+        return {
+            'recorded': len(matched), 'kept': len(kept), 'removed': len(stale),
+            'unmatched': len(existing - matched - kept)
+        }
@@ -4,85 +4,522 @@
 import os
 import re
 import time
+import shutil
 import pycurl
-from io import BytesIO
+from collections import deque
+from urllib.parse import urlparse
+from functools import partial
+from http_client import HttpClient
+from download_manifest import file_sha256
+
+# 不会因重试而改变的HTTP状态码：文件不存在或已删除
+FATAL_STATUS_CODES = {400, 404, 410}
+
+def extract_date_from_url(adjunct_url):
+    """
+    从adjunctUrl中提取日期
+    
+    Args:
+        adjunct_url (str): 文件URL路径
+    
+    Returns:
+        str: 日期字符串 (如 '2014-04-25')
+    """
+    match = re.search(r'(\d{4}-\d{2}-\d{2})', adjunct_url)
+    if match:
+        return match.group(1)
+    return ""
+
+def generate_filename(announcement, date_str):
+    """
+    生成文件名
+    
+    Args:
+        announcement (dict): 公告信息
+        date_str (str): 日期字符串
+    
+    Returns:
+        str: 生成的文件名
+    """
+    sec_code = announcement.get('secCode', '')
+    sec_name = announcement.get('secName', '')
+    title = announcement.get('announcementTitle', '')
+    
+    # 构建文件名
+    filename_parts = []
+    
+    if date_str:
+        filename_parts.append(date_str)
+    
+    if sec_code and sec_code not in title:
+        filename_parts.append(sec_code)
+    
+    if sec_name and sec_name not in title:
+        filename_parts.append(sec_name)
+    
+    # 清理标题中的特殊字符
+    clean_title = re.sub(r'[<>:"/\\|?*]', '_', title)
+    filename_parts.append(clean_title)
+    
+    filename = '_'.join(filename_parts) + '.pdf'
+    return filename
+
+class DownloadTask:
+    """单个文件的下载任务"""
+    
+    def __init__(self, url, file_path, expected_size_kb, max_retries=3, tag=None, announcement_id=None, adjunct_url=None):
+        self.url = url
+        self.file_path = file_path
+        self.part_path = file_path + '.part'  # 下载中的临时文件，校验通过后才改名
+        self.expected_size_kb = expected_size_kb
+        self.max_retries = max_retries
+        self.tag = tag  # 调用方附带的信息，如分类名
+        self.announcement_id = announcement_id  # 下载成功后写入下载记录
+        self.adjunct_url = adjunct_url
+        self.linked = False  # 是否由已下载的副本链接而来，没有实际下载
+        self.attempt = 0
+        self.retry_at = 0  # 重试退避结束的时间戳，此前不启动
+        self.success = None  # None表示尚未结束
+        self.fp = None
+        self.resume_from = 0  # 本次传输的断点续传起点（字节）
+        self.first_chunk = True
+        self.abort_reason = None  # 首个数据块校验失败时的中止原因
+        self.fatal = False  # 中止原因是否不可重试
+        self.range_reset = False  # 是否已因服务端不支持续传而从头下载过
+        self.http_status = 0  # 从响应头解析的状态码
+        self.headers = {}  # 最后一个响应的响应头（键为小写）
 
 class FileDownloader:
     """文件下载类"""
     
-    def __init__(self):
+    def __init__(self, max_concurrent=1, http_client=None, manifest=None, dedupe=True):
         self.base_url = "https://static.cninfo.com.cn/"
-        self.download_delay = 1  # 下载间隔1秒
+        self.max_concurrent = max(1, int(max_concurrent))  # 并行传输数
+        self.http_client = http_client or HttpClient()
+        self.retry_policy = self.http_client.retry_policy  # 与列表请求共用的熔断、退避和统计，None表示失败后立即重试
+        self.manifest = manifest  # DownloadManifest，None表示只按文件判断是否已下载
+        self.dedupe = dedupe  # 重复的公告或内容是否硬链接到已下载的文件
+        self.multi = pycurl.CurlMulti()
+        self.http_client.configure_multi(self.multi)
+        self.handles = []  # 可复用的空闲curl句柄
+        self.pending = deque()  # 等待开始的任务
+        self.active = {}  # curl句柄 -> 任务
+        self.finished = []  # 已结束但尚未被collect取走的任务
     
-    def extract_date_from_url(self, adjunct_url):
+    def get_file_size(self, file_path):
         """
-        从adjunctUrl中提取日期
+        获取文件大小 (KB)
         
         Args:
-            adjunct_url (str): 文件URL路径
-            
+            file_path (str): 文件路径
+        
         Returns:
-            str: 日期字符串 (如 '2014-04-25')
+            int: 文件大小 (KB)
         """
-        match = re.search(r'(\d{4}-\d{2}-\d{2})', adjunct_url)
-        if match:
-            return match.group(1)
-        return ""
+        try:
+            if os.path.exists(file_path):
+                return os.path.getsize(file_path) // 1024
+            return 0
+        except Exception:
+            return 0
     
-    def generate_filename(self, announcement, date_str):
+    def submit(self, task):
         """
-        生成文件名
+        提交下载任务到并行传输队列
+        
+        等待中的任务数达到并行数时会先推进已有传输，避免调用方一次性堆积过多任务。
         
         Args:
-            announcement (dict): 公告信息
-            date_str (str): 日期字符串
-            
+            task (DownloadTask): 下载任务
+        """
+        self.pending.append(task)
+        while len(self.pending) >= self.max_concurrent and self.has_work():
+            self.pump()
+        self._start_ready_tasks()
+        self._perform()
+    
+    def collect(self):
+        """
+        取出已结束的任务
+        
         Returns:
-            str: 生成的文件名
+            list: 已结束的DownloadTask列表（task.success表示是否成功）
+        """
+        finished = self.finished
+        self.finished = []
+        return finished
+    
+    def has_work(self):
+        """是否还有未结束的任务"""
+        return bool(self.pending or self.active)
+    
+    def wait_all(self):
         """
-        sec_code = announcement.get('secCode', '')
-        sec_name = announcement.get('secName', '')
-        title = announcement.get('announcementTitle', '')
+        等待所有任务结束
         
-        # 构建文件名
-        filename_parts = []
+        Returns:
+            list: 已结束的DownloadTask列表
+        """
+        while self.has_work():
+            self.pump()
+        return self.collect()
+    
+    def pump(self, timeout=1.0):
+        """推进一轮传输：启动可开始的任务，等待网络事件并处理完成的传输"""
+        self._start_ready_tasks()
+        if self.active:
+            if self.multi.select(timeout) == -1:
+                time.sleep(0.01)
+            self._perform()
+        elif self.pending:
+            # 所有任务都在等待限速令牌
+            time.sleep(0.05)
+    
+    def _start_ready_tasks(self):
+        """
+        在空闲槽位上启动任务，每个传输需先从限速器取得令牌
         
-        if date_str:
-            filename_parts.append(date_str)
+        已有副本的任务直接链接，不占用槽位；同一附件正在下载时先等它完成，再链接到它。
+        重试退避未结束或主机处于熔断状态的任务留到之后再启动。
+        """
+        free_slots = self.max_concurrent - len(self.active)
+        waiting = []
+        now = time.time()
+        while free_slots > 0 and self.pending:
+            task = self.pending[0]
+            if self.dedupe and self._link_existing_copy(task):
+                self.pending.popleft()
+                continue
+            if self.dedupe and any(active.url == task.url for active in self.active.values()):
+                waiting.append(self.pending.popleft())
+                continue
+            if task.retry_at > now or (self.retry_policy and not self.retry_policy.allow(task.url, reserve=False)):
+                waiting.append(self.pending.popleft())
+                continue
+            if not self.http_client.acquire(task.url, blocking=False):
+                # 超出该主机当前速率，留到下一轮再启动
+                break
+            if self.retry_policy and not self.retry_policy.allow(task.url):
+                # 另一个任务已在试探熔断的主机
+                waiting.append(self.pending.popleft())
+                continue
+            self.pending.popleft()
+            if self._start_transfer(task):
+                free_slots -= 1
+        self.pending.extendleft(reversed(waiting))
+    
+    def _link_existing_copy(self, task):
+        """
+        同一公告已下载到其他分类或其他股票目录时，硬链接到该文件，不再下载
         
-        if sec_code and sec_code not in title:
-            filename_parts.append(sec_code)
+        Returns:
+            bool: 是否已链接（任务已结束）
+        """
+        if not self.manifest or not task.announcement_id or os.path.exists(task.file_path):
+            return False
+        for entry in self.manifest.find_copies(task.announcement_id, task.adjunct_url):
+            if entry['path'] == task.file_path or not os.path.exists(entry['path']):
+                continue
+            if entry['size'] // 1024 < task.expected_size_kb - 10 or os.path.getsize(entry['path']) != entry['size']:
+                continue
+            if not self._link_file(entry['path'], task.file_path, copy_fallback=True):
+                continue
+            self.manifest.record(task.announcement_id, task.file_path, sha256=entry['sha256'], adjunct_url=task.adjunct_url)
+            if os.path.exists(task.part_path):
+                os.remove(task.part_path)
+            print(f"已存在相同公告，链接到: {entry['path']} -> {task.file_path}")
+            task.linked = True
+            task.success = True
+            self.finished.append(task)
+            return True
+        return False
+    
+    def _dedupe_by_content(self, task, sha256):
+        """下载完成后按SHA-256查找内容相同的文件，找到时改为硬链接以节省磁盘"""
+        for entry in self.manifest.find_copies(sha256=sha256):
+            if entry['path'] == task.file_path or not os.path.exists(entry['path']):
+                continue
+            if os.path.samefile(entry['path'], task.file_path):
+                return
+            if self._link_file(entry['path'], task.file_path):
+                print(f"内容与已下载文件相同，改为硬链接: {entry['path']} -> {task.file_path}")
+            return
+    
+    def _link_file(self, source, target, copy_fallback=False):
+        """
+        把target原子替换为source的硬链接
+        
+        Args:
+            source (str): 已下载的文件
+            target (str): 目标路径
+            copy_fallback (bool): 不支持硬链接（如跨分区）时是否改为复制
+        
+        Returns:
+            bool: 是否成功
+        """
+        temp_path = target + '.link'
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            try:
+                os.link(source, temp_path)
+            except OSError:
+                if not copy_fallback:
+                    return False
+                shutil.copyfile(source, temp_path)
+            os.replace(temp_path, target)
+            return True
+        except OSError as e:
+            print(f"链接文件失败: {source} -> {target} ({e})")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+    
+    def _start_transfer(self, task):
+        """创建curl句柄并加入并行传输，已有.part文件时从断点续传"""
+        curl = self.handles.pop() if self.handles else self.http_client.new_curl()
+        try:
+            # 确保目录存在
+            os.makedirs(os.path.dirname(task.file_path), exist_ok=True)
+            task.resume_from = os.path.getsize(task.part_path) if os.path.exists(task.part_path) else 0
+            task.first_chunk = True
+            task.abort_reason = None
+            task.fatal = False
+            task.http_status = 0
+            task.headers = {}
+            task.fp = open(task.part_path, 'ab' if task.resume_from else 'wb')
+            self.http_client.configure_curl(curl)
+            curl.setopt(pycurl.URL, task.url)
+            curl.setopt(pycurl.HEADERFUNCTION, partial(self._header_line, task))
+            curl.setopt(pycurl.WRITEFUNCTION, partial(self._write_chunk, task))
+            if task.resume_from:
+                print(f"断点续传: {task.file_path} (已下载{task.resume_from // 1024}KB)")
+                curl.setopt(pycurl.RESUME_FROM_LARGE, task.resume_from)
+            curl.setopt(pycurl.FOLLOWLOCATION, True)
+            # 大文件不设总超时，连接超时或持续低速时中断，下次从断点继续
+            curl.setopt(pycurl.CONNECTTIMEOUT, 15)
+            curl.setopt(pycurl.LOW_SPEED_LIMIT, 1024)
+            curl.setopt(pycurl.LOW_SPEED_TIME, 30)
+            curl.setopt(pycurl.USERAGENT, 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
+            self.multi.add_handle(curl)
+            self.active[curl] = task
+            return True
+        except Exception as e:
+            if task.fp:
+                task.fp.close()
+                task.fp = None
+            curl.reset()
+            self.handles.append(curl)
+            print(f"下载文件时发生错误: {e}，重试({task.attempt+1}/{task.max_retries})")
+            self._retry_or_fail(task)
+            return False
+    
+    def _header_line(self, task, line):
+        """解析响应头；跟随重定向时每个响应都会重新开始"""
+        line = line.decode('iso-8859-1').strip()
+        if line.startswith('HTTP/'):
+            parts = line.split()
+            task.http_status = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+            task.headers = {}
+        elif ':' in line:
+            key, value = line.split(':', 1)
+            task.headers[key.strip().lower()] = value.strip()
+    
+    def _write_chunk(self, task, data):
+        """
+        写入下载数据，收到第一个数据块时先校验响应
         
-        if sec_name and sec_name not in title:
-            filename_parts.append(sec_name)
+        校验不通过时返回0让curl立即中止传输，不再下载剩余内容。
+        """
+        if task.first_chunk:
+            task.first_chunk = False
+            task.abort_reason, task.fatal = self._check_first_chunk(task, data)
+            if task.abort_reason:
+                return 0
+        task.fp.write(data)
+    
+    def _check_first_chunk(self, task, data):
+        """
+        根据状态码、Content-Type、Content-Length和文件头判断响应是否为所需的PDF
         
-        # 清理标题中的特殊字符
-        clean_title = re.sub(r'[<>:"/\\|?*]', '_', title)
-        filename_parts.append(clean_title)
+        Returns:
+            tuple: (中止原因, 是否不可重试)，响应正常时中止原因为None
+        """
+        if task.http_status not in (200, 206):
+            return f"HTTP状态码: {task.http_status}", task.http_status in FATAL_STATUS_CODES
+        content_type = task.headers.get('content-type', '').lower()
+        if 'text/html' in content_type:
+            # 错误页或验证码页，多为被限流，稍后重试
+            return f"返回了网页而不是PDF (Content-Type: {content_type})", False
+        total_bytes = self._expected_total_bytes(task)
+        if total_bytes is not None and total_bytes // 1024 < task.expected_size_kb - 10:
+            return f"文件长度不足: 期望{task.expected_size_kb}KB, 服务端返回{total_bytes // 1024}KB", True
+        if task.resume_from == 0 and task.url.lower().endswith('.pdf') and not data.startswith(b'%PDF'[:len(data)]):
+            if data.lstrip()[:1] == b'<':
+                return "返回内容不是PDF（疑似错误页）", False
+            return "返回内容不是PDF", True
+        return None, False
+    
+    def _perform(self):
+        """驱动CurlMulti并处理已完成的传输"""
+        while True:
+            ret, _ = self.multi.perform()
+            if ret != pycurl.E_CALL_MULTI_PERFORM:
+                break
+        while True:
+            queued, ok_list, err_list = self.multi.info_read()
+            for curl in ok_list:
+                self._finish_transfer(curl, None)
+            for curl, errno, errmsg in err_list:
+                self._finish_transfer(curl, errmsg, errno)
+            if queued == 0:
+                break
+    
+    def _finish_transfer(self, curl, error, errno=None):
+        """传输结束后检查状态码和文件大小，决定成功、重试或失败"""
+        task = self.active.pop(curl)
+        http_code = curl.getinfo(pycurl.HTTP_CODE)
+        # 首字节耗时反映服务端状态，与文件大小无关
+        latency = curl.getinfo(pycurl.STARTTRANSFER_TIME)
+        if task.abort_reason:
+            # 主动中止不算网络错误；可重试的中止（如验证码页）视同被限流，让限速器降速
+            network_error = not task.fatal
+        else:
+            network_error = bool(error) and errno != pycurl.E_RANGE_ERROR
+        self.http_client.feedback(task.url, http_code or None, latency, error=network_error)
+        if self.retry_policy:
+            # 网络错误、被限流和服务端临时错误计入熔断；404等说明主机可用
+            healthy = not network_error and not self.retry_policy.is_retryable(status_code=http_code)
+            if self.retry_policy.record(task.url, healthy, curl.getinfo(pycurl.TOTAL_TIME)):
+                self._circuit_opened(task.url)
+        self.multi.remove_handle(curl)
+        # 重置并保留句柄，下次传输复用
+        curl.reset()
+        self.handles.append(curl)
+        task.fp.close()
+        task.fp = None
         
-        filename = '_'.join(filename_parts) + '.pdf'
-        return filename
+        if task.abort_reason:
+            if task.fatal:
+                print(f"下载中止: {task.abort_reason}，不再重试: {task.file_path}")
+                self._fail(task)
+            else:
+                print(f"下载中止: {task.abort_reason}，重试({task.attempt+1}/{task.max_retries})")
+                self._retry_or_fail(task)
+        elif errno == pycurl.E_RANGE_ERROR and not task.range_reset:
+            # 服务端忽略Range返回了完整文件，curl拒绝续传；删除.part后从头下载一次，不计入重试次数
+            print(f"服务端不支持断点续传，从头下载: {task.file_path}")
+            if os.path.exists(task.part_path):
+                os.remove(task.part_path)
+            task.range_reset = True
+            self.pending.append(task)
+        elif error:
+            print(f"下载文件时发生错误: {error}，重试({task.attempt+1}/{task.max_retries})")
+            self._retry_or_fail(task)
+        elif http_code == 416:
+            # 续传起点超出文件长度，说明.part已损坏，删除后从头下载
+            print(f"断点续传范围无效，重新下载: {task.file_path}，重试({task.attempt+1}/{task.max_retries})")
+            if os.path.exists(task.part_path):
+                os.remove(task.part_path)
+            self._retry_or_fail(task)
+        elif http_code in FATAL_STATUS_CODES:
+            print(f"下载失败，HTTP状态码: {http_code}，不再重试: {task.file_path}")
+            self._fail(task)
+        elif http_code not in (200, 206):
+            print(f"下载失败，HTTP状态码: {http_code}，重试({task.attempt+1}/{task.max_retries})")
+            self._retry_or_fail(task)
+        else:
+            # 续传拼接后的总长度必须与响应头一致，否则.part已损坏
+            total_bytes = self._expected_total_bytes(task)
+            part_bytes = os.path.getsize(task.part_path)
+            if total_bytes is not None and part_bytes != total_bytes:
+                print(f"文件长度与响应头不符: 期望{total_bytes}字节, 实际{part_bytes}字节，重新下载，重试({task.attempt+1}/{task.max_retries})")
+                os.remove(task.part_path)
+                self._retry_or_fail(task)
+                return
+            # 检查文件大小，校验通过后原子改名为正式文件
+            actual_size = self.get_file_size(task.part_path)
+            if actual_size >= task.expected_size_kb - 10:
+                os.replace(task.part_path, task.file_path)
+                print(f"下载成功: {task.file_path} ({actual_size}KB)")
+                if self.manifest and task.announcement_id:
+                    sha256 = file_sha256(task.file_path)
+                    if self.dedupe:
+                        self._dedupe_by_content(task, sha256)
+                    self.manifest.record(task.announcement_id, task.file_path, sha256=sha256, adjunct_url=task.adjunct_url)
+                task.success = True
+                self.finished.append(task)
+            else:
+                print(f"文件大小不匹配: 期望{task.expected_size_kb}KB, 实际{actual_size}KB，重试({task.attempt+1}/{task.max_retries})")
+                self._retry_or_fail(task)
     
-    def get_file_size(self, file_path):
+    def _expected_total_bytes(self, task):
+        """根据Content-Range或Content-Length推算完整文件的字节数，无法推算时返回None"""
+        content_range = task.headers.get('content-range', '')
+        if '/' in content_range:
+            total = content_range.rsplit('/', 1)[1]
+            if total.isdigit():
+                return int(total)
+        content_length = task.headers.get('content-length', '')
+        if content_length.isdigit():
+            return task.resume_from + int(content_length)
+        return None
+    
+    def _retry_or_fail(self, task):
+        """失败的任务按重试策略退避后重新排队（没有策略时立即排队，间隔由限速器控制），超过次数则标记失败"""
+        task.attempt += 1
+        if task.attempt < task.max_retries:
+            if self.retry_policy:
+                task.retry_at = time.time() + self.retry_policy.retry_delay(task.url, task.attempt - 1, task.headers.get('retry-after'))
+            self.pending.append(task)
+        else:
+            print(f"下载失败，已重试{task.max_retries}次: {task.file_path}")
+            if self.retry_policy:
+                self.retry_policy.record_failure(task.url)
+            self._fail(task)
+    
+    def _circuit_opened(self, url):
         """
-        获取文件大小 (KB)
+        主机熔断时，等待中的同主机任务各计一次失败，主机持续不可用时这些任务依次失败而不是无限等待
         
         Args:
-            file_path (str): 文件路径
-            
-        Returns:
-            int: 文件大小 (KB)
+            url (str): 导致熔断的请求地址
         """
-        try:
-            if os.path.exists(file_path):
-                return os.path.getsize(file_path) // 1024
-            return 0
-        except Exception:
-            return 0
+        host = urlparse(url).hostname
+        remaining = deque()
+        for task in self.pending:
+            if urlparse(task.url).hostname == host:
+                task.attempt += 1
+                if task.attempt >= task.max_retries:
+                    print(f"{host} 处于熔断状态，下载失败: {task.file_path}")
+                    self.retry_policy.record_failure(task.url)
+                    self._fail(task)
+                    continue
+            remaining.append(task)
+        self.pending = remaining
+    
+    def _fail(self, task):
+        """标记任务失败，清理没有内容的.part文件"""
+        if os.path.exists(task.part_path) and os.path.getsize(task.part_path) == 0:
+            os.remove(task.part_path)
+        task.success = False
+        self.finished.append(task)
+    
+    def _path_taken(self, file_path, announcement_id):
+        """文件路径是否已被其他公告的下载记录或未结束的任务占用"""
+        announcement_id = str(announcement_id)
+        for task in list(self.pending) + list(self.active.values()):
+            if task.file_path == file_path and str(task.announcement_id) != announcement_id:
+                return True
+        if self.manifest:
+            owner = self.manifest.owner_of(file_path)
+            return owner is not None and owner != announcement_id
+        return False
     
     def download_file(self, url, file_path, expected_size_kb, max_retries=3):
         """
-        使用pycurl下载文件，支持重试
+        使用pycurl下载文件，支持重试（同步等待该文件完成）
         
         Args:
             url (str): 下载URL
@@ -92,97 +529,96 @@ class FileDownloader:
         Returns:
             bool: 下载是否成功
         """
-        attempt = 0
-        while attempt < max_retries:
-            if(attempt > 0):
-                time.sleep(self.download_delay)
-            try:
-                # 确保目录存在
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                
-                # 使用pycurl下载
-                with open(file_path, 'wb') as f:
-                    curl = pycurl.Curl()
-                    curl.setopt(pycurl.URL, url)
-                    curl.setopt(pycurl.WRITEDATA, f)
-                    curl.setopt(pycurl.FOLLOWLOCATION, True)
-                    curl.setopt(pycurl.TIMEOUT, 60)
-                    curl.setopt(pycurl.USERAGENT, 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
-                    curl.perform()
-                    http_code = curl.getinfo(pycurl.HTTP_CODE)
-                    curl.close()
-                
-                if http_code == 200:
-                    # 检查文件大小
-                    actual_size = self.get_file_size(file_path)
-                    if actual_size >= expected_size_kb - 10:
-                        print(f"下载成功: {file_path} ({actual_size}KB)")
-                        return True
-                    else:
-                        print(f"文件大小不匹配: 期望{expected_size_kb}KB, 实际{actual_size}KB，重试({attempt+1}/{max_retries})")
-                        attempt += 1
-                        continue
-                else:
-                    print(f"下载失败，HTTP状态码: {http_code}，重试({attempt+1}/{max_retries})")
-                    attempt += 1
-                    continue
-                
-            except Exception as e:
-                print(f"下载文件时发生错误: {e}，重试({attempt+1}/{max_retries})")
-                attempt += 1
-                continue
-        print(f"下载失败，已重试{max_retries}次: {file_path}")
-        return False
+        task = DownloadTask(url, file_path, expected_size_kb, max_retries)
+        self.submit(task)
+        while task.success is None:
+            self.pump()
+        return task.success
     
-    def download_announcement(self, announcement, save_dir, category_name):
+    def submit_announcement(self, announcement, save_dir, category_name):
         """
-        下载单个公告文件
+        检查单个公告文件并提交下载任务，不等待下载完成
         
         Args:
             announcement (dict): 公告信息
             save_dir (str): 保存目录
             category_name (str): 分类名称
-            
+        
         Returns:
-            bool or str: 下载是否成功，若为'skip_category'表示遇到已存在文件
+            DownloadTask or bool or str: 已提交的任务；False表示无法下载；'skip_category'表示遇到已存在文件
         """
         adjunct_url = announcement.get('adjunctUrl', '')
         if not adjunct_url:
             print("公告没有附件URL")
             return False
         
+        # 获取期望文件大小
+        expected_size = announcement.get('adjunctSize', 0)
+        
+        # 先查下载记录，已记录的公告不再访问文件系统
+        announcement_id = announcement.get('announcementId')
+        if self.manifest and announcement_id:
+            entry = self.manifest.get(announcement_id, os.path.join(save_dir, category_name))
+            if entry and entry['size'] // 1024 >= expected_size - 10:
+                print(f"下载记录中已存在，跳过下载: {entry['path']} ({entry['size'] // 1024}KB)")
+                return 'skip_category'
+        
         # 构建完整URL
         full_url = self.base_url + adjunct_url
         
         # 提取日期
-        date_str = self.extract_date_from_url(adjunct_url)
+        date_str = extract_date_from_url(adjunct_url)
         
         # 生成文件名
-        filename = self.generate_filename(announcement, date_str)
+        filename = generate_filename(announcement, date_str)
         
         # 构建完整保存路径
         file_path = os.path.join(save_dir, category_name, filename)
         
-        # 获取期望文件大小
-        expected_size = announcement.get('adjunctSize', 0)
+        # 文件名已被其他公告占用（标题相同）时，在文件名后附加公告ID
+        if announcement_id and self._path_taken(file_path, announcement_id):
+            file_path = f"{file_path[:-4]}_{announcement_id}.pdf"
         
         # 检查文件是否已存在且完整
         actual_size = self.get_file_size(file_path)
         if os.path.exists(file_path):
             if actual_size >= expected_size - 10:
                 print(f"文件已存在且完整，跳过下载: {file_path} ({actual_size}KB)")
+                if self.manifest and announcement_id:
+                    # 补充早期下载的文件，下次直接按记录跳过
+                    self.manifest.record(announcement_id, file_path, adjunct_url=adjunct_url)
                 return 'skip_category'
             else:
-                print(f"文件已存在但不完整，将重新下载: {file_path} (实际{actual_size}KB, 期望{expected_size}KB)")
+                print(f"文件已存在但不完整，将继续下载: {file_path} (实际{actual_size}KB, 期望{expected_size}KB)")
+                # 旧版本直接写入正式文件，转为.part后续传
+                if not os.path.exists(file_path + '.part'):
+                    os.replace(file_path, file_path + '.part')
         
         print(f"开始下载: {file_path}")
         print(f"URL: {full_url}")
         
-        # 下载文件
-        success = self.download_file(full_url, file_path, expected_size, max_retries=3)
+        task = DownloadTask(
+            full_url, file_path, expected_size, max_retries=3, tag=category_name,
+            announcement_id=announcement_id, adjunct_url=adjunct_url
+        )
+        self.submit(task)
+        return task
+    
+    def download_announcement(self, announcement, save_dir, category_name):
+        """
+        下载单个公告文件
         
-        if success:
-            # 下载成功后等待1秒
-            time.sleep(self.download_delay)
+        Args:
+            announcement (dict): 公告信息
+            save_dir (str): 保存目录
+            category_name (str): 分类名称
         
-        return success 
\ No newline at end of file
+        Returns:
+            bool or str: 下载是否成功，若为'skip_category'表示遇到已存在文件
+        """
+        task = self.submit_announcement(announcement, save_dir, category_name)
+        if not isinstance(task, DownloadTask):
+            return task
+        while task.success is None:
+            self.pump()
+        return task.success
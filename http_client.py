@@ -0,0 +1,175 @@
+"""
+HTTP传输模块 - 为各巨潮客户端提供共享的连接池
+"""
+import time
+import pycurl
+import requests
+from requests.adapters import HTTPAdapter
+
+class HttpClient:
+    """共享HTTP客户端，复用到www.cninfo.com.cn和static.cninfo.com.cn的长连接"""
+    
+    def __init__(self, pool_size=10, max_per_host=4, timeout=30, rate_limiter=None, retry_policy=None):
+        """
+        Args:
+            pool_size (int): 连接池总大小（缓存的主机连接池数量及curl的连接缓存数）
+            max_per_host (int): 单个主机的最大并发连接数
+            timeout (int): 请求超时时间（秒）
+            rate_limiter (RateLimiter|None): 按主机的自适应限速器，None表示不限速
+            retry_policy (RetryPolicy|None): 重试和熔断策略，None表示不重试
+        """
+        self.pool_size = max(1, int(pool_size))
+        self.max_per_host = max(1, int(max_per_host))
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        
+        # requests会话：keep-alive，按主机分池，池满时阻塞等待而不是新建连接
+        self.session = requests.Session()
+        self.session.headers.update({'Connection': 'keep-alive'})
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.max_per_host,
+            pool_block=True
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # curl共享对象：在所有下载句柄之间共享DNS缓存和TLS会话
+        self.curl_share = pycurl.CurlShare()
+        self.curl_share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+        self.curl_share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+    
+    def get(self, url, **kwargs):
+        """发送GET请求"""
+        return self.request('GET', url, **kwargs)
+    
+    def post(self, url, **kwargs):
+        """发送POST请求"""
+        return self.request('POST', url, **kwargs)
+    
+    def get_json(self, url, **kwargs):
+        """发送GET请求并解析JSON"""
+        return self.request_json('GET', url, **kwargs)
+    
+    def post_json(self, url, **kwargs):
+        """发送POST请求并解析JSON"""
+        return self.request_json('POST', url, **kwargs)
+    
+    def request(self, method, url, **kwargs):
+        """
+        通过共享会话发送请求
+        
+        超时、连接错误和可重试的状态码按重试策略重试；用完重试次数后返回最后一次的响应，
+        非2xx状态码仍由调用方处理。
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        
+        def attempt():
+            response = self._send(method, url, **kwargs)
+            return response, response.status_code, response.headers.get('Retry-After')
+        
+        if self.retry_policy is None:
+            return attempt()[0]
+        return self.retry_policy.call(url, attempt)
+    
+    def request_json(self, method, url, **kwargs):
+        """
+        发送请求并解析JSON响应
+        
+        除request的重试条件外，响应不是合法JSON（被限流时可能返回验证码页面）时也会重试。
+        
+        Returns:
+            object: 解析后的响应
+        
+        Raises:
+            requests.exceptions.RequestException: 请求失败或状态码不是2xx
+            json.JSONDecodeError: 重试后响应仍不是合法JSON
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        
+        def attempt():
+            response = self._send(method, url, **kwargs)
+            response.raise_for_status()
+            return response.json(), response.status_code, None
+        
+        if self.retry_policy is None:
+            return attempt()[0]
+        return self.retry_policy.call(url, attempt)
+    
+    def _send(self, method, url, **kwargs):
+        """经限速器发出一次请求并上报结果"""
+        self.acquire(url)
+        start = time.time()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            self.feedback(url, error=True, latency=time.time() - start)
+            raise
+        self.feedback(url, response.status_code, response.elapsed.total_seconds())
+        return response
+    
+    def acquire(self, url, blocking=True):
+        """
+        按限速器申请向URL所在主机发出一个请求
+        
+        Args:
+            url (str): 请求地址
+            blocking (bool): 未到时间时是否等待
+            
+        Returns:
+            bool: 是否可以发出请求
+        """
+        if self.rate_limiter is None:
+            return True
+        return self.rate_limiter.acquire(url, blocking)
+    
+    def feedback(self, url, status_code=None, latency=None, error=False):
+        """
+        向限速器上报请求结果，限速器据此调整该主机的速率
+        
+        Args:
+            url (str): 请求地址
+            status_code (int|None): HTTP状态码
+            latency (float|None): 首字节耗时（秒）
+            error (bool): 是否发生超时或连接错误
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.feedback(url, status_code, latency, error)
+    
+    def configure_multi(self, multi):
+        """
+        设置CurlMulti的连接池参数
+        
+        Args:
+            multi (pycurl.CurlMulti): 并行下载句柄
+        """
+        multi.setopt(pycurl.M_MAX_HOST_CONNECTIONS, self.max_per_host)
+        multi.setopt(pycurl.M_MAX_TOTAL_CONNECTIONS, self.pool_size)
+        multi.setopt(pycurl.M_MAXCONNECTS, self.pool_size)
+    
+    def new_curl(self):
+        """
+        创建挂载共享对象的curl句柄
+        
+        句柄reset后仍保留共享对象，复用时只需调用configure_curl。
+        
+        Returns:
+            pycurl.Curl: 下载句柄
+        """
+        curl = pycurl.Curl()
+        curl.setopt(pycurl.SHARE, self.curl_share)
+        return curl
+    
+    def configure_curl(self, curl):
+        """
+        为curl句柄设置keep-alive
+        
+        Args:
+            curl (pycurl.Curl): 下载句柄
+        """
+        curl.setopt(pycurl.TCP_KEEPALIVE, 1)
+    
+    def close(self):
+        """关闭会话，释放连接"""
+        self.session.close()
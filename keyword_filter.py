@@ -0,0 +1,200 @@
+"""
+关键词过滤模块 - 把只包含/排除规则编译为正则，一次扫描判断标题是否命中
+"""
+import re
+import sys
+import time
+import random
+from datetime import datetime
+
+# 以此前缀开头的规则按正则表达式处理，其余按普通关键词处理
+REGEX_PREFIX = 're:'
+
+def _trie_pattern(words):
+    """
+    把普通关键词构造成前缀树形式的正则，公共前缀只匹配一次
+    
+    Args:
+        words (list): 关键词列表
+    
+    Returns:
+        str: 正则表达式，没有关键词时返回空字符串
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+    
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char != '']
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # 当前位置已是某个关键词的结尾，后续字符可有可无
+        return f'(?:{body})?' if '' in node else body
+    
+    return build(trie)
+
+def compile_rules(rules):
+    """
+    把规则列表编译为一个正则
+    
+    Args:
+        rules (list): 关键词或以 "re:" 开头的正则表达式
+    
+    Returns:
+        re.Pattern: 编译后的正则，没有规则时返回None；无法编译的正则规则提示后跳过
+    """
+    words = [rule for rule in rules if rule and not rule.startswith(REGEX_PREFIX)]
+    alternatives = []
+    for rule in rules:
+        if not rule.startswith(REGEX_PREFIX):
+            continue
+        try:
+            re.compile(rule[len(REGEX_PREFIX):])
+        except re.error as e:
+            print(f"配置错误: 正则规则 {rule} 无效 ({e})，已忽略")
+            continue
+        alternatives.append(f'(?:{rule[len(REGEX_PREFIX):]})')
+    if words:
+        alternatives.insert(0, _trie_pattern(words))
+    if not alternatives:
+        return None
+    return re.compile('|'.join(alternatives))
+
+def parse_date_range(spec):
+    """
+    解析日期范围
+    
+    Args:
+        spec (str): 形如 "2020-01-01~2024-12-31"，任一端可留空
+    
+    Returns:
+        tuple: (起始毫秒时间戳或None, 截止毫秒时间戳或None)，截止日期包含当天；格式错误时提示并返回 (None, None)
+    """
+    if not spec or not spec.strip():
+        return None, None
+    start, _, end = spec.strip().partition('~')
+    try:
+        start_ms = int(datetime.strptime(start.strip(), '%Y-%m-%d').timestamp() * 1000) if start.strip() else None
+        end_ms = int(datetime.strptime(end.strip(), '%Y-%m-%d').timestamp() * 1000) + 86400000 if end.strip() else None
+    except ValueError:
+        print(f"配置错误: DATE_RANGE={spec} 格式无效，应形如 2020-01-01~2024-12-31，已忽略日期过滤")
+        return None, None
+    return start_ms, end_ms
+
+class KeywordFilter:
+    """
+    公告过滤器
+    
+    只包含和排除规则各编译为一个正则，每个标题只需扫描一次，
+    与规则数量基本无关。另可按公告日期范围过滤。
+    """
+    
+    def __init__(self, include_keywords=None, exclude_keywords=None, date_range=None):
+        """
+        Args:
+            include_keywords (list): 只包含关键词，支持 "re:正则"
+            exclude_keywords (list): 排除关键字，支持 "re:正则"
+            date_range (str): 公告日期范围，形如 "2020-01-01~2024-12-31"
+        """
+        self.include_keywords = list(include_keywords or [])
+        self.exclude_keywords = list(exclude_keywords or [])
+        self.include = compile_rules(self.include_keywords)
+        self.exclude = compile_rules(self.exclude_keywords)
+        self.date_from, self.date_to = parse_date_range(date_range)
+    
+    def __bool__(self):
+        """是否有任何过滤规则"""
+        return bool(self.include or self.exclude or self.date_from or self.date_to)
+    
+    def search_keys(self):
+        """
+        可交给服务端searchkey参数查询的只包含关键词
+        
+        Returns:
+            list: 只包含关键词都是普通关键词时返回它们；没有只包含规则或含正则规则时返回None
+        """
+        if not self.include_keywords or any(rule.startswith(REGEX_PREFIX) for rule in self.include_keywords):
+            return None
+        return list(self.include_keywords)
+    
+    def check(self, announcement):
+        """
+        判断公告是否需要跳过
+        
+        Args:
+            announcement (dict): 公告信息
+        
+        Returns:
+            str: 跳过原因，None表示保留
+        """
+        title = announcement.get('announcementTitle', '')
+        # 先判断只包含关键词
+        if self.include and not self.include.search(title):
+            return "不包含指定关键词"
+        # 再判断排除关键词
+        if self.exclude and self.exclude.search(title):
+            return "命中排除关键字"
+        if self.date_from or self.date_to:
+            announcement_time = announcement.get('announcementTime') or 0
+            if (self.date_from and announcement_time < self.date_from) or (self.date_to and announcement_time >= self.date_to):
+                return "不在指定日期范围"
+        return None
+
+def benchmark(rule_count=300, title_count=100000, seed=0):
+    """
+    对比逐个关键词判断和编译后的过滤器的耗时
+    
+    Args:
+        rule_count (int): 排除规则数量
+        title_count (int): 标题数量
+        seed (int): 随机种子
+    """
+    rng = random.Random(seed)
+    vocabulary = [
+        '关于', '公司', '年度报告', '半年度报告', '季度报告', '摘要', '英文版', '董事会', '监事会', '决议',
+        '公告', '股东大会', '独立董事', '意见', '募集资金', '使用', '情况', '专项', '审计', '法律意见书',
+        '控股股东', '质押', '解除', '回购', '股份', '进展', '变更', '会计师事务所', '担保', '关联交易',
+    ]
+    titles = [''.join(rng.choice(vocabulary) for _ in range(rng.randint(3, 8))) for _ in range(title_count)]
+    rules = set()
+    while len(rules) < rule_count:
+        rules.add(''.join(rng.choice(vocabulary) for _ in range(rng.randint(2, 3))) + str(rng.randint(0, 9)) * rng.randint(0, 1))
+    rules = sorted(rules)
+    announcements = [{'announcementTitle': title} for title in titles]
+    
+    start = time.perf_counter()
+    naive_hits = sum(1 for title in titles if any(kw in title for kw in rules))
+    naive_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    keyword_filter = KeywordFilter(exclude_keywords=rules)
+    compile_time = time.perf_counter() - start
+    start = time.perf_counter()
+    compiled_hits = sum(1 for announcement in announcements if keyword_filter.check(announcement))
+    compiled_time = time.perf_counter() - start
+    
+    print(f"规则数: {rule_count}, 标题数: {title_count}, 命中: {naive_hits}/{compiled_hits}")
+    print(f"逐个关键词判断: {naive_time:.3f}秒")
+    print(f"编译后的过滤器: {compiled_time:.3f}秒 (编译 {compile_time * 1000:.1f}毫秒)")
+    if compiled_time:
+        print(f"加速比: {naive_time / compiled_time:.1f}x")
+    if naive_hits != compiled_hits:
+        print("错误: 两种方式的命中数不一致")
+        sys.exit(1)
+
+def main():
+    """主函数"""
+    if len(sys.argv) < 2 or sys.argv[1] != 'bench':
+        print("使用方法:")
+        print("  python keyword_filter.py bench [规则数] [标题数]  # 过滤性能测试")
+        return
+    rule_count = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    title_count = int(sys.argv[3]) if len(sys.argv) > 3 else 100000
+    benchmark(rule_count, title_count)
+
+if __name__ == "__main__":
+    main()
@@ -4,25 +4,70 @@
 import os
 import sys
 from config import Config
-from cache_manager import CacheManager
+from cache_manager import CacheManager, parse_ttls
 from stock_searcher import StockSearcher
 from plate_parser import PlateParser
 from announcement_fetcher import AnnouncementFetcher
 from file_downloader import FileDownloader
+from download_manifest import DownloadManifest
+from http_client import HttpClient
+from pipeline import AnnouncementPipeline
+from rate_limiter import RateLimiter
+from run_checkpoint import RunCheckpoint, announcement_key
 from dotenv import load_dotenv
 
 class AnnouncementDownloader:
     """公告下载器主类"""
     
-    def __init__(self):
+    def __init__(self, rate_limiter=None):
+        """
+        Args:
+            rate_limiter (RateLimiter|None): 按主机的自适应限速器，批量模式下由各进程共享
+        """
         self.config = Config()
-        self.cache_manager = CacheManager(cache_dir=Config.CACHE_DIR)
-        self.stock_searcher = StockSearcher(self.cache_manager)
-        self.plate_parser = PlateParser(self.cache_manager)
-        self.announcement_fetcher = AnnouncementFetcher(self.cache_manager)
-        self.file_downloader = FileDownloader()
+        self.cache_manager = CacheManager(
+            cache_dir=Config.CACHE_DIR,
+            backend=Config.CACHE_BACKEND,
+            compression=Config.CACHE_COMPRESSION,
+            memory_limit=int(Config.CACHE_MEMORY_MB * 1024 * 1024),
+            ttls=parse_ttls(Config.CACHE_TTLS),
+            stale_seconds=Config.CACHE_STALE_HOURS * 3600
+        )
+        if rate_limiter is None:
+            rate_limiter = RateLimiter(
+                RateLimiter.parse_host_limits(Config.RATE_LIMITS),
+                default_rate=Config.RATE_LIMIT
+            )
+        # 所有客户端共享同一个连接池
+        self.http_client = HttpClient(
+            pool_size=Config.HTTP_POOL_SIZE,
+            max_per_host=Config.HTTP_MAX_PER_HOST,
+            rate_limiter=rate_limiter,
+            retry_policy=Config.create_retry_policy()
+        )
+        # 本地股票目录，命中时不需要搜索股票和请求股票页面
+        self.stock_directory = Config.create_stock_directory()
+        self.stock_searcher = StockSearcher(self.cache_manager, self.http_client, self.stock_directory)
+        self.plate_parser = PlateParser(self.cache_manager, self.http_client, self.stock_directory)
+        self.announcement_fetcher = AnnouncementFetcher(
+            self.cache_manager,
+            self.http_client,
+            backfill_workers=Config.BACKFILL_WORKERS if Config.BACKFILL_MODE else 0,
+            backfill_start_year=Config.BACKFILL_START_YEAR,
+            prefetch_window=Config.PAGE_PREFETCH
+        )
+        # 下载记录，同时保存增量更新的高水位
+        self.manifest = DownloadManifest(Config.DOWNLOADS_DIR)
+        self.file_downloader = FileDownloader(
+            max_concurrent=Config.DOWNLOAD_CONCURRENCY,
+            http_client=self.http_client,
+            manifest=self.manifest,
+            dedupe=Config.DEDUPE_LINKS
+        )
+        # 最近一次run的统计：成功下载、跳过、失败的公告数，列表不完整的分类数和请求重试次数
+        self.summary = {'downloaded': 0, 'skipped': 0, 'failed': 0, 'incomplete': 0, 'retries': 0}
     
-    def run(self, stock_code, category_filter=None, incremental_update=False):
+    def run(self, stock_code, category_filter=None, incremental_update=False, resume=False):
         """
         运行下载流程
         
@@ -30,13 +75,19 @@ class AnnouncementDownloader:
             stock_code (str): 股票代码
             category_filter (str|None): 分类过滤（中文名或key）
             incremental_update (bool): 是否增量更新
+            resume (bool): 是否从上次中断的分类和页码继续
         """
         print(f"开始处理股票: {stock_code}")
         print("=" * 50)
+        self.summary = {'downloaded': 0, 'skipped': 0, 'failed': 0, 'incomplete': 0, 'retries': 0}
+        self.announcement_fetcher.reset_list_stats()
+        self.http_client.retry_policy.reset_stats()
+        self.cache_manager.reset_stats()
         
-        # 1. 加载配置文件
+        # 1. 加载配置文件（同一实例处理多只股票时只加载一次）
         print("步骤1: 加载配置文件")
-        self.config.load_list_search()
+        if not self.config.list_search:
+            self.config.load_list_search()
         if not self.config.list_search:
             print("错误: 无法加载配置文件")
             return False
@@ -86,6 +137,11 @@ class AnnouncementDownloader:
         if exclude_keywords:
             print(f"排除关键字: {exclude_keywords}")
         
+        # 关键词和日期范围编译为一个过滤器，每个标题只扫描一次
+        keyword_filter = self.config.get_keyword_filter()
+        # 只包含关键词交给服务端查询，本地过滤仍然保留
+        searchkeys = keyword_filter.search_keys() if Config.SERVER_SEARCH else None
+        
         # 如果指定了分类过滤，只保留匹配的分类
         if category_filter:
             # 支持逗号分隔的多个分类过滤
@@ -110,8 +166,149 @@ class AnnouncementDownloader:
         download_dir = os.path.join(self.config.download_base_dir, stock_name)
         os.makedirs(download_dir, exist_ok=True)
         
-        # 6. 循环处理每个分类
-        total_downloaded = 0
+        # 增量更新时按各分类的高水位只查询新的日期区间
+        se_dates = self._incremental_windows(stock_info['code'], category_list) if incremental_update else {}
+        
+        # 每处理完一页保存断点；续传时跳过已完成的分类，进行中的分类沿用上次的日期区间
+        checkpoint = RunCheckpoint(self.manifest, stock_info['code'], resume)
+        finished_stats = {}
+        pending_categories = []
+        for category_item in category_list:
+            category_name = category_item.get('value', '')
+            if checkpoint.is_done(category_name):
+                print(f"断点续传：分类 {category_name} 已完成，跳过")
+                finished_stats[category_name] = checkpoint.saved_stats(category_name)
+                continue
+            saved_se_date = checkpoint.saved_se_date(category_name)
+            if saved_se_date is not None:
+                se_dates[category_item.get('key', '')] = saved_se_date
+            pending_categories.append(category_item)
+        
+        # 6. 处理每个分类
+        if Config.PIPELINE_MODE or Config.CATEGORY_WORKERS > 1:
+            # 流水线模式：列表获取、过滤和下载并发进行，可同时处理多个分类
+            pipeline = AnnouncementPipeline(
+                self.announcement_fetcher,
+                self.file_downloader,
+                queue_size=Config.PIPELINE_QUEUE_SIZE,
+                category_workers=Config.CATEGORY_WORKERS
+            )
+            stats = pipeline.run(
+                stock_info,
+                plate,
+                pending_categories,
+                download_dir,
+                title_filter=keyword_filter.check if keyword_filter else None,
+                incremental_update=incremental_update,
+                se_dates=se_dates,
+                searchkeys=searchkeys,
+                checkpoint=checkpoint
+            )
+        else:
+            stats = self._run_sequential(
+                stock_info,
+                plate,
+                pending_categories,
+                download_dir,
+                keyword_filter,
+                incremental_update,
+                se_dates,
+                searchkeys,
+                checkpoint
+            )
+        stats.update(finished_stats)
+        
+        self._update_watermarks(stock_info['code'], category_list, stats)
+        for item in stats.values():
+            self.summary['downloaded'] += item['downloaded']
+            self.summary['skipped'] += item['skipped'] + item['filtered']
+            self.summary['failed'] += item['failed']
+        request_stats = self.http_client.retry_policy.describe()
+        self.summary['incomplete'] = len(self.announcement_fetcher.incomplete_categories)
+        self.summary['retries'] = sum(item['retries'] for item in request_stats.values())
+        total_downloaded = self.summary['downloaded']
+        
+        print("\n" + "=" * 50)
+        print(f"下载完成! 总共下载 {total_downloaded} 个文件")
+        print(f"文件保存在: {download_dir}")
+        print(f"当前限速(次/秒): {self.http_client.rate_limiter.describe()}")
+        list_stats = self.announcement_fetcher.list_stats
+        print(
+            f"公告列表: 共获取 {list_stats['pages']} 页（每页{self.announcement_fetcher.page_size or 30}条），"
+            f"请求服务端 {list_stats['requests']} 次，来自缓存 {list_stats['cached']} 页；"
+            f"每页30条时需要 {list_stats['baseline']} 页，节省 {list_stats['baseline'] - list_stats['pages']} 页"
+        )
+        if list_stats['failed_pages']:
+            print(f"警告: {list_stats['failed_pages']} 页公告列表重试后仍获取失败，{self.summary['incomplete']} 个分类不完整，未推进其增量更新高水位")
+        for host, item in request_stats.items():
+            print(
+                f"请求统计 {host}: {item['requests']} 次, 重试 {item['retries']} 次, 失败 {item['failures']} 次, "
+                f"熔断 {item['circuit_opens']} 次, 平均耗时 {item['avg_latency']:.2f}秒, 最长 {item['max_latency']:.2f}秒"
+            )
+        
+        # 等待后台刷新过期缓存，按需清理缓存
+        self.cache_manager.wait_revalidations()
+        if Config.CACHE_GC_AFTER_RUN:
+            result = self.cache_manager.gc(int(Config.CACHE_MAX_MB * 1024 * 1024))
+            print(f"缓存清理: 删除过期 {result['expired']} 条, 超出上限 {result['evicted']} 条, 保留 {result['kept']} 条 ({result['size'] / 1024 / 1024:.1f}MB)")
+        
+        # 显示缓存信息
+        cache_info = self.cache_manager.get_cache_info()
+        print(f"缓存信息: 股票搜索{cache_info['top_search_count']}个, 股票页面{cache_info['stock_count']}个, 公告查询{cache_info['announcement_count']}个")
+        cache_stats = self.cache_manager.get_cache_stats()
+        print(
+            f"缓存命中: 内存{cache_stats['memory_hits']}次, 磁盘{cache_stats['disk_hits']}次, "
+            f"过期后先用旧数据{cache_stats['stale_hits']}次, 过期{cache_stats['expired']}次, "
+            f"未命中{cache_stats['misses']}次, 淘汰{cache_stats['evictions']}次 "
+            f"(内存缓存 {cache_stats['memory_entries']} 条, {cache_stats['memory_size'] / 1024:.0f}KB)"
+        )
+        
+        return True
+    
+    def _incremental_windows(self, stock_code, category_list):
+        """
+        根据高水位计算各分类的查询日期区间
+        
+        Args:
+            stock_code (str): 股票代码
+            category_list (list): 分类列表
+        
+        Returns:
+            dict: 分类key -> seDate，没有高水位的分类不在其中（按原方式翻页直到遇到已存在文件）
+        """
+        se_dates = {}
+        for category_item in category_list:
+            category_key = category_item.get('key', '')
+            watermark = self.manifest.get_watermark(stock_code, category_key)
+            if watermark:
+                se_dates[category_key] = self.announcement_fetcher.build_se_date(watermark)
+                print(f"增量更新：{category_item.get('value', '')} 仅查询 {se_dates[category_key]}")
+        return se_dates
+    
+    def _update_watermarks(self, stock_code, category_list, stats):
+        """
+        推进各分类的高水位
+        
+        有下载失败或公告列表不完整的分类不推进，下次仍会查询到失败的公告。
+        """
+        for category_item in category_list:
+            category_stats = stats.get(category_item.get('value', ''))
+            if category_item.get('key', '') in self.announcement_fetcher.incomplete_categories:
+                continue
+            if category_stats and category_stats['latest'] and not category_stats['failed']:
+                self.manifest.set_watermark(stock_code, category_item.get('key', ''), category_stats['latest'])
+    
+    def _run_sequential(self, stock_info, plate, category_list, download_dir, keyword_filter, incremental_update, se_dates=None, searchkeys=None, checkpoint=None):
+        """
+        逐个分类获取公告列表并下载
+        
+        Args:
+            checkpoint (RunCheckpoint): 运行断点，每处理完一页保存一次
+        
+        Returns:
+            dict: 分类名 -> {'count', 'downloaded', 'filtered', 'skipped', 'failed', 'latest'}
+        """
+        stats = {}
         
         for category_item in category_list:
             category_key = category_item.get('key', '')
@@ -123,71 +320,101 @@ class AnnouncementDownloader:
             print(f"\n处理分类: {category_name} ({category_key})")
             print("-" * 30)
             
-            # 增量更新时不使用缓存
-            fetcher = self.announcement_fetcher
-            cache_manager_backup = None
-            if incremental_update:
-                cache_manager_backup = fetcher.cache_manager
-                fetcher.cache_manager = None
-            
             # 使用生成器逐条获取和下载公告
-            category_downloaded = 0
-            announcement_count = 0
-            skip_this_category = False
+            category_stats = {'count': 0, 'downloaded': 0, 'filtered': 0, 'skipped': 0, 'failed': 0, 'latest': 0}
+            stats[category_name] = category_stats
+            se_date = (se_dates or {}).get(category_key, '')
+            start_page, page_size, listed = 1, None, False
+            if checkpoint:
+                start_page, page_size, resumed = checkpoint.begin(category_name, category_stats, se_date)
+                self._resubmit(resumed, download_dir, category_name, keyword_filter, category_stats, checkpoint)
+                listed = checkpoint.is_listed(category_name)
             
-            for announcement in fetcher.fetch_announcements_generator(
+            # 增量更新时不使用缓存；上次已获取完列表时只需等待重新提交的下载
+            for announcement in [] if listed else self.announcement_fetcher.fetch_announcements_generator(
                 stock_info['code'],
                 stock_info['orgId'],
                 plate,
                 category_key,
-                category_value=category_name
+                page_size=page_size,
+                category_value=category_name,
+                use_cache=not incremental_update,
+                se_date=se_date,
+                searchkeys=searchkeys,
+                start_page=start_page,
+                on_page=(lambda next_page, size, name=category_name: checkpoint.page_done(name, next_page, size)) if checkpoint else None
             ):
-                announcement_count += 1
-                title = announcement.get('announcementTitle', '')
-                # 先判断只包含关键词
-                if include_keywords and not any(kw in title for kw in include_keywords):
-                    print(f"跳过公告: {title} (不包含指定关键词)")
-                    continue
-                # 再判断排除关键词
-                if exclude_keywords and any(kw in title for kw in exclude_keywords):
-                    print(f"跳过公告: {title} (命中排除关键字)")
+                if checkpoint:
+                    checkpoint.track(category_name, announcement)
+                category_stats['count'] += 1
+                category_stats['latest'] = max(category_stats['latest'], announcement.get('announcementTime') or 0)
+                reason = keyword_filter.check(announcement) if keyword_filter else None
+                if reason:
+                    print(f"跳过公告: {announcement.get('announcementTitle', '')} ({reason})")
+                    category_stats['filtered'] += 1
+                    if checkpoint:
+                        checkpoint.release(category_name, announcement_key(announcement))
                     continue
-                # 立即下载当前公告
-                result = self.file_downloader.download_announcement(
+                # 提交当前公告到并行下载队列
+                result = self.file_downloader.submit_announcement(
                     announcement,
                     download_dir,
                     category_name
                 )
-                if result == 'skip_category' and incremental_update:
-                    print(f"增量更新：遇到已存在文件，跳过当前分类 {category_name}")
-                    skip_this_category = True
-                    break
-                if result is True:
-                    category_downloaded += 1
+                if checkpoint and (result is False or result == 'skip_category'):
+                    checkpoint.release(category_name, announcement_key(announcement))
+                if result == 'skip_category':
+                    category_stats['skipped'] += 1
+                    # 中断时正在处理的页中的公告可能已经下载过，不据此判断后面都已下载
+                    if incremental_update and not (checkpoint and checkpoint.is_resumed(category_name, announcement)):
+                        print(f"增量更新：遇到已存在文件，跳过当前分类 {category_name}")
+                        break
+                elif result is False:
+                    category_stats['failed'] += 1
+                self._count_finished(self.file_downloader.collect(), category_stats, checkpoint)
                 
                 # 每下载10个文件显示一次进度
-                if announcement_count % 10 == 0:
-                    print(f"分类 {category_name} 进度: {announcement_count} 个公告，成功下载 {category_downloaded} 个")
+                if category_stats['count'] % 10 == 0:
+                    print(f"分类 {category_name} 进度: {category_stats['count']} 个公告，成功下载 {category_stats['downloaded']} 个")
             
-            print(f"分类 {category_name} 下载完成: {category_downloaded}/{announcement_count}")
-            total_downloaded += category_downloaded
-
-            # 恢复cache_manager
-            if incremental_update and cache_manager_backup is not None:
-                fetcher.cache_manager = cache_manager_backup
-            
-            if skip_this_category:
-                continue
-        
-        print("\n" + "=" * 50)
-        print(f"下载完成! 总共下载 {total_downloaded} 个文件")
-        print(f"文件保存在: {download_dir}")
+            # 等待当前分类剩余的下载任务结束
+            if checkpoint:
+                checkpoint.list_done(category_name, category_key not in self.announcement_fetcher.incomplete_categories)
+            self._count_finished(self.file_downloader.wait_all(), category_stats, checkpoint)
+            print(f"分类 {category_name} 下载完成: {category_stats['downloaded']}/{category_stats['count']}")
         
-        # 显示缓存信息
-        cache_info = self.cache_manager.get_cache_info()
-        print(f"缓存信息: 股票搜索{cache_info['top_search_count']}个, 股票页面{cache_info['stock_count']}个, 公告查询{cache_info['announcement_count']}个")
+        return stats
+    
+    def _resubmit(self, announcements, download_dir, category_name, keyword_filter, category_stats, checkpoint):
+        """
+        重新提交上次中断时尚未下载完成的公告
         
-        return True
+        这些公告已计入上次的统计；中断前已下载完成的按下载记录跳过，计为已存在，不触发增量更新的跳过分类。
+        """
+        for announcement in announcements:
+            reason = keyword_filter.check(announcement) if keyword_filter else None
+            if reason:
+                category_stats['filtered'] += 1
+                result = None
+            else:
+                result = self.file_downloader.submit_announcement(announcement, download_dir, category_name)
+                if result == 'skip_category':
+                    category_stats['skipped'] += 1
+                elif result is False:
+                    category_stats['failed'] += 1
+            if result is None or result is False or result == 'skip_category':
+                checkpoint.release(category_name, announcement_key(announcement))
+            self._count_finished(self.file_downloader.collect(), category_stats, checkpoint)
+    
+    def _count_finished(self, tasks, category_stats, checkpoint=None):
+        """统计已结束的下载任务"""
+        for task in tasks:
+            if task.success:
+                category_stats['downloaded'] += 1
+            else:
+                category_stats['failed'] += 1
+            if checkpoint:
+                checkpoint.release(task.tag, task.announcement_id or task.adjunct_url)
 
 def main():
     """主函数"""
@@ -195,24 +422,29 @@ def main():
     stock_code = None
     category_filter = None
     incremental_update = False
+    # --resume：从上次中断的分类和页码继续
+    args = [arg for arg in sys.argv[1:] if arg != '--resume']
+    resume = len(args) < len(sys.argv) - 1
     # 优先命令行参数
-    if len(sys.argv) >= 2:
-        stock_code = sys.argv[1]
-        category_filter = sys.argv[2] if len(sys.argv) > 2 else None
+    if args:
+        stock_code = args[0]
+        category_filter = args[1] if len(args) > 1 else None
     else:
         # 从环境变量读取
         stock_code = os.getenv("STOCK_CODE")
         category_filter = os.getenv("CATEGORY_FILTER")
         if not stock_code:
-            print("使用方法: python main.py <股票代码> [分类名或key] 或在.env中设置STOCK_CODE/CATEGORY_FILTER/INCREMENTAL_UPDATE")
+            print("使用方法: python main.py <股票代码> [分类名或key] [--resume] 或在.env中设置STOCK_CODE/CATEGORY_FILTER/INCREMENTAL_UPDATE")
             print("示例: python main.py 601225 年度报告")
+            print("中断后继续: python main.py 601225 年度报告 --resume")
             print("或在.env中添加: STOCK_CODE=601225")
             return
     # 增量更新参数
     incremental_update = os.getenv("INCREMENTAL_UPDATE", "false").lower() == "true"
     # 创建下载器实例并运行
     downloader = AnnouncementDownloader()
-    success = downloader.run(stock_code, category_filter, incremental_update)
+    downloader.stock_directory.refresh_if_stale(downloader.http_client)
+    success = downloader.run(stock_code, category_filter, incremental_update, resume)
     if success:
         print("\n程序执行成功!")
     else:
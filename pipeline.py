@@ -0,0 +1,300 @@
+"""
+流水线模块 - 公告列表获取、过滤和文件下载并发进行
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from run_checkpoint import announcement_key
+
+_CATEGORY_END = object()  # 分类列表获取结束标记
+_DONE = object()  # 全部列表获取结束标记
+
+class _ListGate:
+    """
+    增量更新时分类列表的闸门
+    
+    分类还没有公告被提交下载时，列表线程每放入一个公告都等下载阶段处理完再取下一个，
+    遇到已存在文件时分类被跳过，不会在此之前请求或预取后面的页。
+    有公告被提交下载后闸门打开，列表线程不再等待。
+    """
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.listed = 0
+        self.handled = 0
+        self.opened = False
+    
+    def wait(self, skipped, abort):
+        """列表线程放入一个公告后，等待它被处理或闸门打开"""
+        with self._cond:
+            self.listed += 1
+            while not (self.opened or self.handled >= self.listed or skipped.is_set() or abort.is_set()):
+                self._cond.wait(0.5)
+    
+    def handled_one(self, opened=False):
+        """
+        过滤或下载阶段处理完一个公告
+        
+        Args:
+            opened (bool): 公告已提交下载（或下载失败），分类不会因已存在文件而跳过
+        """
+        with self._cond:
+            self.handled += 1
+            self.opened = self.opened or opened
+            self._cond.notify_all()
+
+class AnnouncementPipeline:
+    """
+    流水线下载类
+    
+    列表线程逐页获取公告放入有界队列，过滤线程筛选后放入下载队列，
+    调用线程负责驱动并行下载。队列满时上游阻塞，形成背压。
+    多个分类可同时获取列表，它们共用同一个下载器和连接池，
+    即共用全局的并发数和请求速率。
+    """
+    
+    def __init__(self, fetcher, downloader, queue_size=100, category_workers=1):
+        """
+        Args:
+            fetcher (AnnouncementFetcher): 公告获取器
+            downloader (FileDownloader): 文件下载器
+            queue_size (int): 各阶段之间队列的最大长度
+            category_workers (int): 同时获取列表的分类数
+        """
+        self.fetcher = fetcher
+        self.downloader = downloader
+        self.queue_size = max(1, int(queue_size))
+        self.category_workers = max(1, int(category_workers))
+        self.checkpoint = None
+        self._gates = {}
+    
+    def run(self, stock_info, plate, category_list, download_dir, title_filter=None, incremental_update=False, se_dates=None, searchkeys=None, checkpoint=None):
+        """
+        运行流水线
+        
+        Args:
+            stock_info (dict): 股票信息
+            plate (str): 板块代码
+            category_list (list): 分类列表
+            download_dir (str): 下载目录
+            title_filter (callable): 过滤函数，参数为公告，返回跳过原因，None表示保留
+            incremental_update (bool): 是否增量更新
+            se_dates (dict): 分类key -> 查询日期区间，不在其中的分类不限日期
+            searchkeys (list): 交给服务端查询的标题关键词
+            checkpoint (RunCheckpoint): 运行断点，列表线程每处理完一页保存一次
+        
+        Returns:
+            dict: 分类名 -> {'count': 公告数, 'downloaded': 成功下载数, 'filtered': 被过滤数,
+                  'skipped': 已存在跳过数, 'failed': 失败数, 'latest': 最新公告时间}
+        """
+        categories = [
+            (item.get('key', ''), item.get('value', ''))
+            for item in category_list
+            if item.get('key') and item.get('value')
+        ]
+        stats = {
+            name: {'count': 0, 'downloaded': 0, 'filtered': 0, 'skipped': 0, 'failed': 0, 'latest': 0}
+            for _, name in categories
+        }
+        skipped = {name: threading.Event() for _, name in categories}
+        self.checkpoint = checkpoint
+        # 增量更新时第1页通常就会遇到已存在的文件，列表线程不应跑在下载阶段判断之前
+        self._gates = {name: _ListGate() for _, name in categories} if incremental_update else {}
+        abort = threading.Event()
+        list_queue = queue.Queue(maxsize=self.queue_size)
+        download_queue = queue.Queue(maxsize=self.queue_size)
+        
+        lister = threading.Thread(
+            target=self._list_stage,
+            args=(stock_info, plate, categories, incremental_update, se_dates or {}, searchkeys, stats, skipped, abort, list_queue),
+            daemon=True
+        )
+        filterer = threading.Thread(
+            target=self._filter_stage,
+            args=(title_filter, stats, skipped, abort, list_queue, download_queue),
+            daemon=True
+        )
+        lister.start()
+        filterer.start()
+        
+        try:
+            self._download_stage(download_dir, incremental_update, stats, skipped, download_queue)
+        finally:
+            abort.set()
+            lister.join()
+            filterer.join()
+        
+        self._count_finished(self.downloader.wait_all(), stats)
+        for _, name in categories:
+            print(f"分类 {name} 下载完成: {stats[name]['downloaded']}/{stats[name]['count']}")
+        return stats
+    
+    def _put(self, target_queue, item, abort):
+        """带中止检查的阻塞入队，返回是否成功"""
+        while not abort.is_set():
+            try:
+                target_queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _list_stage(self, stock_info, plate, categories, incremental_update, se_dates, searchkeys, stats, skipped, abort, list_queue):
+        """列表阶段：按分类并发数获取各分类公告放入队列"""
+        try:
+            with ThreadPoolExecutor(max_workers=self.category_workers) as executor:
+                futures = [
+                    executor.submit(
+                        self._list_category,
+                        stock_info, plate, category_key, category_name,
+                        incremental_update, se_dates.get(category_key, ''), searchkeys, stats, skipped, abort, list_queue
+                    )
+                    for category_key, category_name in categories
+                ]
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"获取分类列表时发生错误: {e}")
+        finally:
+            self._put(list_queue, _DONE, abort)
+    
+    def _list_category(self, stock_info, plate, category_key, category_name, incremental_update, se_date, searchkeys, stats, skipped, abort, list_queue):
+        """
+        获取单个分类的公告放入队列，分类被标记跳过时停止翻页
+        
+        断点续传时先把上次未完成的公告放入队列（已计入上次的统计），再从记录的页码继续。
+        """
+        if abort.is_set():
+            return
+        print(f"\n处理分类: {category_name} ({category_key})")
+        print("-" * 30)
+        start_page, page_size = 1, None
+        checkpoint = self.checkpoint
+        if checkpoint:
+            start_page, page_size, resumed = checkpoint.begin(category_name, stats[category_name], se_date)
+            for announcement in resumed:
+                if not self._put_listed(list_queue, category_name, announcement, skipped, abort):
+                    return
+            if checkpoint.is_listed(category_name):
+                # 上次已获取完列表，只需处理重新提交的公告
+                checkpoint.list_done(category_name)
+                self._put(list_queue, (category_name, _CATEGORY_END), abort)
+                return
+        generator = self.fetcher.fetch_announcements_generator(
+            stock_info['code'],
+            stock_info['orgId'],
+            plate,
+            category_key,
+            page_size=page_size,
+            category_value=category_name,
+            use_cache=not incremental_update,
+            se_date=se_date,
+            searchkeys=searchkeys,
+            start_page=start_page,
+            on_page=(lambda next_page, size: checkpoint.page_done(category_name, next_page, size)) if checkpoint else None
+        )
+        try:
+            for announcement in generator:
+                if skipped[category_name].is_set():
+                    break
+                if checkpoint:
+                    checkpoint.track(category_name, announcement)
+                stats[category_name]['count'] += 1
+                stats[category_name]['latest'] = max(stats[category_name]['latest'], announcement.get('announcementTime') or 0)
+                if not self._put_listed(list_queue, category_name, announcement, skipped, abort):
+                    return
+                # 在取下一个公告（可能触发请求下一页）之前检查
+                if skipped[category_name].is_set():
+                    break
+        finally:
+            generator.close()
+        if checkpoint:
+            checkpoint.list_done(category_name, category_key not in self.fetcher.incomplete_categories)
+        self._put(list_queue, (category_name, _CATEGORY_END), abort)
+    
+    def _put_listed(self, list_queue, category_name, announcement, skipped, abort):
+        """放入一个公告，增量更新时等待下载阶段判断分类是否跳过，返回是否成功"""
+        if not self._put(list_queue, (category_name, announcement), abort):
+            return False
+        gate = self._gates.get(category_name)
+        if gate:
+            gate.wait(skipped[category_name], abort)
+        return True
+    
+    def _filter_stage(self, title_filter, stats, skipped, abort, list_queue, download_queue):
+        """过滤阶段：按关键词等规则筛选公告"""
+        while not abort.is_set():
+            try:
+                item = list_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                self._put(download_queue, _DONE, abort)
+                return
+            category_name, announcement = item
+            if announcement is not _CATEGORY_END and not skipped[category_name].is_set() and title_filter:
+                reason = title_filter(announcement)
+                if reason:
+                    print(f"跳过公告: {announcement.get('announcementTitle', '')} ({reason})")
+                    stats[category_name]['filtered'] += 1
+                    self._release(category_name, announcement)
+                    self._handled(category_name)
+                    continue
+            if not self._put(download_queue, item, abort):
+                return
+    
+    def _download_stage(self, download_dir, incremental_update, stats, skipped, download_queue):
+        """下载阶段：在调用线程中提交任务并驱动并行下载"""
+        while True:
+            try:
+                item = download_queue.get(timeout=0.05 if self.downloader.has_work() else 0.5)
+            except queue.Empty:
+                self._count_finished(self.downloader.collect(), stats)
+                if self.downloader.has_work():
+                    self.downloader.pump(timeout=0.05)
+                continue
+            if item is _DONE:
+                return
+            category_name, announcement = item
+            if announcement is _CATEGORY_END:
+                print(f"分类 {category_name} 列表获取完成，共 {stats[category_name]['count']} 个公告")
+                continue
+            if skipped[category_name].is_set():
+                self._release(category_name, announcement)
+                self._handled(category_name)
+                continue
+            result = self.downloader.submit_announcement(announcement, download_dir, category_name)
+            if result is False or result == 'skip_category':
+                self._release(category_name, announcement)
+            if result == 'skip_category':
+                stats[category_name]['skipped'] += 1
+                # 中断时正在处理的页中的公告可能已经下载过，不据此判断后面都已下载
+                if incremental_update and not (self.checkpoint and self.checkpoint.is_resumed(category_name, announcement)):
+                    print(f"增量更新：遇到已存在文件，跳过当前分类 {category_name}")
+                    skipped[category_name].set()
+            elif result is False:
+                stats[category_name]['failed'] += 1
+            self._handled(category_name, opened=result != 'skip_category')
+            self._count_finished(self.downloader.collect(), stats)
+    
+    def _handled(self, category_name, opened=False):
+        """通知列表线程分类的一个公告已处理完"""
+        gate = self._gates.get(category_name)
+        if gate:
+            gate.handled_one(opened)
+    
+    def _release(self, category_name, announcement):
+        """公告已处理完，从断点的未完成公告中移除"""
+        if self.checkpoint:
+            self.checkpoint.release(category_name, announcement_key(announcement))
+    
+    def _count_finished(self, tasks, stats):
+        """按分类统计已结束的下载任务"""
+        for task in tasks:
+            if task.success:
+                stats[task.tag]['downloaded'] += 1
+            else:
+                stats[task.tag]['failed'] += 1
+            if self.checkpoint:
+                self.checkpoint.release(task.tag, task.announcement_id or task.adjunct_url)
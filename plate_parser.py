@@ -3,16 +3,33 @@
 """
 import requests
 import re
-from bs4 import BeautifulSoup
+import codecs
+from http_client import HttpClient
+
+# 页面脚本中的板块变量，如 var plate = "sse";
+PLATE_PATTERN = re.compile(r'var\s+plate\s*=\s*["\']([^"\']+)["\'];')
 
 class PlateParser:
     """板块解析类"""
     
-    def __init__(self, cache_manager=None):
+    # 每次从响应中读取的字节数
+    CHUNK_SIZE = 8192
+    # 跨数据块匹配时保留的上一块末尾字符数
+    OVERLAP = 256
+    
+    def __init__(self, cache_manager=None, http_client=None, stock_directory=None):
+        """
+        Args:
+            cache_manager (CacheManager): 缓存管理器
+            http_client (HttpClient): 共享HTTP客户端
+            stock_directory (StockDirectory): 本地股票目录，优先从中查找
+        """
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         self.cache_manager = cache_manager
+        self.http_client = http_client or HttpClient()
+        self.stock_directory = stock_directory
     
     def get_plate(self, stock_code, org_id, sjsts_bond):
         """
@@ -22,44 +39,51 @@ class PlateParser:
             stock_code (str): 股票代码
             org_id (str): 机构ID
             sjsts_bond (str): 是否可转债
-            
+        
         Returns:
             str: 板块代码 (如 'sse', 'szse', 'bj')
         """
+        # 先查本地股票目录
+        entry = self.stock_directory.lookup(stock_code) if self.stock_directory is not None else None
+        if entry and entry.get('orgId') == org_id and entry.get('plate'):
+            print(f"使用股票目录获取板块信息: {entry['plate']}")
+            return entry['plate']
+        
         # 检查缓存
         if self.cache_manager:
-            cached_html = self.cache_manager.load_stock_cache(stock_code, org_id, sjsts_bond)
-            if cached_html:
-                # 从缓存的HTML中解析板块信息
-                soup = BeautifulSoup(cached_html, 'html.parser')
-                plate = self._extract_plate_from_soup(soup)
+            plate = self.cache_manager.load_plate_cache(org_id)
+            if not plate:
+                # 早期版本缓存的是整个页面
+                cached_html = self.cache_manager.load_stock_cache(stock_code, org_id, sjsts_bond)
+                plate = self._extract_plate(cached_html) if cached_html else None
                 if plate:
-                    print(f"使用缓存获取板块信息: {plate}")
-                    return plate
+                    self.cache_manager.save_plate_cache(org_id, plate)
+            if plate:
+                print(f"使用缓存获取板块信息: {plate}")
+                self._remember(stock_code, plate)
+                return plate
         
         try:
             url = f"https://www.cninfo.com.cn/new/disclosure/stock?stockCode={stock_code}&orgId={org_id}&sjstsBond={sjsts_bond}"
             
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            
-            html_content = response.text
-            
-            # 保存到缓存
-            if self.cache_manager:
-                self.cache_manager.save_stock_cache(stock_code, org_id, sjsts_bond, html_content)
-            
-            # 解析HTML页面
-            soup = BeautifulSoup(html_content, 'html.parser')
-            plate = self._extract_plate_from_soup(soup)
+            response = self.http_client.get(url, headers=self.headers, stream=True)
+            try:
+                response.raise_for_status()
+                plate = self._scan_plate(response)
+            finally:
+                response.close()
             
             if plate:
+                # 只缓存板块代码，不缓存整个页面
+                if self.cache_manager:
+                    self.cache_manager.save_plate_cache(org_id, plate)
                 print(f"成功获取板块信息: {plate}")
+                self._remember(stock_code, plate)
                 return plate
             else:
                 print("未找到板块信息")
                 return None
-                
+        
         except requests.exceptions.RequestException as e:
             print(f"请求板块信息失败: {e}")
             return None
@@ -67,16 +91,32 @@ class PlateParser:
             print(f"解析板块信息时发生错误: {e}")
             return None
     
-    def _extract_plate_from_soup(self, soup):
-        """从BeautifulSoup对象中提取板块信息"""
-        # 查找包含plate变量的script标签
-        scripts = soup.find_all('script')
+    def _scan_plate(self, response):
+        """
+        边接收边查找板块变量，找到后不再读取页面剩余部分
         
-        for script in scripts:
-            if script.string:
-                # 使用正则表达式匹配 var plate = "xxx";
-                match = re.search(r'var\s+plate\s*=\s*["\']([^"\']+)["\'];', script.string)
-                if match:
-                    return match.group(1)
+        Args:
+            response (requests.Response): 以stream=True发出的请求的响应
         
-        return None 
\ No newline at end of file
+        Returns:
+            str: 板块代码，页面中没有时返回None
+        """
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        tail = ''
+        for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+            text = tail + decoder.decode(chunk)
+            plate = self._extract_plate(text)
+            if plate:
+                return plate
+            tail = text[-self.OVERLAP:]
+        return self._extract_plate(tail + decoder.decode(b'', final=True))
+    
+    def _remember(self, stock_code, plate):
+        """把板块代码补充进本地股票目录"""
+        if self.stock_directory is not None:
+            self.stock_directory.set_plate(stock_code, plate)
+    
+    def _extract_plate(self, text):
+        """从页面文本中提取板块信息"""
+        match = PLATE_PATTERN.search(text)
+        return match.group(1) if match else None
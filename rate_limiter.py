@@ -0,0 +1,174 @@
+"""
+限速模块 - 按主机控制对巨潮的请求速率，可在多个进程间共享
+"""
+import time
+import multiprocessing
+from urllib.parse import urlparse
+
+# 触发降速的HTTP状态码：限流、拒绝访问和服务端错误
+THROTTLE_STATUS_CODES = {403, 429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    自适应令牌桶（AIMD）
+    
+    请求正常时速率按加法逐步回升到上限，遇到限流状态码、超时或响应过慢时速率按乘法减半。
+    状态保存在multiprocessing共享内存中，可在进程间共享。
+    """
+    
+    def __init__(self, max_rate, min_rate=None, slow_threshold=3.0):
+        """
+        Args:
+            max_rate (float): 每秒请求数上限，也是初始速率
+            min_rate (float): 降速后的最低速率，默认为上限的1/20
+            slow_threshold (float): 首字节耗时超过该秒数视为响应过慢
+        """
+        self.max_rate = float(max_rate)
+        self.min_rate = float(min_rate) if min_rate else max(self.max_rate / 20, 0.05)
+        self.increase_step = self.max_rate / 20  # 每次成功增加的速率
+        self.slow_threshold = slow_threshold
+        # [当前速率, 剩余令牌, 上次补充令牌的时间]
+        self._state = multiprocessing.Array('d', [self.max_rate, 1.0, time.time()])
+    
+    @property
+    def rate(self):
+        """当前速率"""
+        return self._state[0]
+    
+    def acquire(self, blocking=True):
+        """
+        取一个令牌
+        
+        Args:
+            blocking (bool): 令牌不足时是否等待
+        
+        Returns:
+            bool: 是否取得令牌（blocking为True时总是True）
+        """
+        while True:
+            with self._state.get_lock():
+                rate, tokens, last = self._state[0], self._state[1], self._state[2]
+                now = time.time()
+                # 桶容量随速率变化，至少1个令牌
+                tokens = min(max(1.0, rate), tokens + (now - last) * rate)
+                if tokens >= 1:
+                    self._state[1] = tokens - 1
+                    self._state[2] = now
+                    return True
+                self._state[1] = tokens
+                self._state[2] = now
+                wait = (1 - tokens) / rate
+            if not blocking:
+                return False
+            time.sleep(wait)
+    
+    def feedback(self, status_code=None, latency=None, error=False):
+        """
+        根据请求结果调整速率
+        
+        Args:
+            status_code (int|None): HTTP状态码
+            latency (float|None): 首字节耗时（秒）
+            error (bool): 是否发生超时或连接错误
+        """
+        with self._state.get_lock():
+            rate = self._state[0]
+            if error or status_code in THROTTLE_STATUS_CODES:
+                rate = rate / 2
+            elif latency is not None and latency > self.slow_threshold:
+                rate = rate * 0.8
+            else:
+                rate = rate + self.increase_step
+            self._state[0] = min(self.max_rate, max(self.min_rate, rate))
+
+class RateLimiter:
+    """
+    按主机分配令牌桶的全局限速器
+    
+    令牌桶在构造时创建于共享内存中，通过进程池initializer传给子进程后，
+    所有进程和线程对同一主机共用同一个速率。未配置的主机使用默认速率。
+    """
+    
+    def __init__(self, host_limits=None, default_rate=0):
+        """
+        Args:
+            host_limits (dict): 主机名 -> 每秒请求数上限
+            default_rate (float): 未配置主机的每秒请求数上限，0表示不限速
+        """
+        self.buckets = {
+            host: TokenBucket(rate)
+            for host, rate in (host_limits or {}).items()
+            if rate > 0
+        }
+        self.default_bucket = TokenBucket(default_rate) if default_rate > 0 else None
+    
+    def _bucket(self, url):
+        """获取URL对应主机的令牌桶，不限速时返回None"""
+        host = urlparse(url).hostname or ''
+        return self.buckets.get(host, self.default_bucket)
+    
+    def acquire(self, url, blocking=True):
+        """
+        申请向URL所在主机发出一个请求
+        
+        Args:
+            url (str): 请求地址
+            blocking (bool): 未到时间时是否等待
+        
+        Returns:
+            bool: 是否获得许可（blocking为True时总是True）
+        """
+        bucket = self._bucket(url)
+        if bucket is None:
+            return True
+        return bucket.acquire(blocking)
+    
+    def feedback(self, url, status_code=None, latency=None, error=False):
+        """
+        上报请求结果，用于调整对应主机的速率
+        
+        Args:
+            url (str): 请求地址
+            status_code (int|None): HTTP状态码
+            latency (float|None): 首字节耗时（秒）
+            error (bool): 是否发生超时或连接错误
+        """
+        bucket = self._bucket(url)
+        if bucket is not None:
+            bucket.feedback(status_code, latency, error)
+    
+    def describe(self):
+        """
+        当前各主机速率
+        
+        Returns:
+            dict: 主机名 -> 当前每秒请求数
+        """
+        rates = {host: round(bucket.rate, 2) for host, bucket in self.buckets.items()}
+        if self.default_bucket is not None:
+            rates['*'] = round(self.default_bucket.rate, 2)
+        return rates
+    
+    @staticmethod
+    def parse_host_limits(spec):
+        """
+        解析按主机配置的限速
+        
+        Args:
+            spec (str): 形如 "www.cninfo.com.cn=4,static.cninfo.com.cn=3"，支持中英文逗号和分号分隔
+        
+        Returns:
+            dict: 主机名 -> 每秒请求数上限
+        """
+        limits = {}
+        for sep in [',', '，', ';', '；']:
+            spec = spec.replace(sep, ',')
+        for item in spec.split(','):
+            if '=' not in item:
+                continue
+            host, rate = item.split('=', 1)
+            try:
+                limits[host.strip()] = float(rate)
+            except ValueError:
+                print(f"忽略无效的限速配置: {item.strip()}")
+        return limits
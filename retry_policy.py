@@ -0,0 +1,308 @@
+"""
+重试策略模块 - 区分可重试的错误，按指数退避加随机抖动重试，并按主机熔断
+"""
+import time
+import random
+import threading
+from urllib.parse import urlparse
+import requests
+
+# 可重试的HTTP状态码：超时、限流和服务端临时错误
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """主机处于熔断状态，未发出请求"""
+
+class CircuitBreaker:
+    """
+    按主机的熔断器
+    
+    连续失败达到阈值后熔断，冷却期内不再向该主机发出请求；冷却结束后只放行一个试探请求，
+    成功则恢复，失败则重新熔断。
+    """
+    
+    def __init__(self, threshold=5, cooldown=30):
+        """
+        Args:
+            threshold (int): 连续失败多少次后熔断，0表示不熔断
+            cooldown (float): 熔断后的冷却时间（秒）
+        """
+        self.threshold = int(threshold)
+        self.cooldown = float(cooldown)
+        self._lock = threading.Lock()
+        # 主机名 -> {'failures': 连续失败次数, 'opened_at': 熔断时间, 'probing': 是否已放行试探请求}
+        self._hosts = {}
+    
+    def wait_time(self, host, reserve=True):
+        """
+        申请向主机发出一个请求
+        
+        Args:
+            host (str): 主机名
+            reserve (bool): 冷却结束时是否占用试探请求的名额，False只查看状态
+        
+        Returns:
+            float: 需要等待的秒数，0表示可以立即发出
+        """
+        if self.threshold <= 0:
+            return 0
+        with self._lock:
+            state = self._hosts.get(host)
+            if not state or not state['opened_at']:
+                return 0
+            remaining = state['opened_at'] + self.cooldown - time.time()
+            if remaining > 0:
+                return remaining
+            if state['probing']:
+                # 试探请求尚未返回，稍后再看
+                return min(1.0, self.cooldown)
+            if reserve:
+                state['probing'] = True
+            return 0
+    
+    def record(self, host, success):
+        """
+        记录请求结果
+        
+        Args:
+            host (str): 主机名
+            success (bool): 是否成功
+        
+        Returns:
+            bool: 本次失败是否导致熔断
+        """
+        if self.threshold <= 0:
+            return False
+        with self._lock:
+            state = self._hosts.setdefault(host, {'failures': 0, 'opened_at': 0, 'probing': False})
+            if success:
+                state.update(failures=0, opened_at=0, probing=False)
+                return False
+            state['failures'] += 1
+            if state['probing'] or (not state['opened_at'] and state['failures'] >= self.threshold):
+                state.update(opened_at=time.time(), probing=False)
+                return True
+            return False
+    
+    def describe(self):
+        """
+        处于熔断状态的主机
+        
+        Returns:
+            list: 主机名列表
+        """
+        with self._lock:
+            return sorted(host for host, state in self._hosts.items() if state['opened_at'])
+
+class RetryPolicy:
+    """
+    所有巨潮请求共用的重试策略
+    
+    超时、连接错误、408/429/5xx以及响应不是合法JSON（如被限流时返回的验证码页面）视为临时错误，
+    按指数退避加随机抖动重试；其余4xx直接失败。重试前检查熔断器，主机熔断时等待冷却结束，
+    仍不可用时抛出CircuitOpenError。同时按主机统计请求、重试、失败次数和耗时。
+    自行调度请求的调用方（如pycurl并行下载）用allow、record和retry_delay接入同一套熔断、退避和统计。
+    """
+    
+    def __init__(self, retries=4, backoff_base=0.5, backoff_max=30, breaker=None):
+        """
+        Args:
+            retries (int): 失败后最多重试次数
+            backoff_base (float): 第1次重试的最大等待时间（秒），之后每次翻倍
+            backoff_max (float): 单次等待时间上限（秒）
+            breaker (CircuitBreaker|None): 熔断器，None表示不熔断
+        """
+        self.retries = max(0, int(retries))
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self.breaker = breaker or CircuitBreaker(threshold=0)
+        self._lock = threading.Lock()
+        self.stats = {}
+    
+    def is_retryable(self, error=None, status_code=None):
+        """
+        判断错误是否值得重试
+        
+        Args:
+            error (Exception|None): 请求或解析时抛出的异常
+            status_code (int|None): HTTP状态码
+        
+        Returns:
+            bool: 是否可重试
+        """
+        if isinstance(error, CircuitOpenError):
+            return False
+        if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            status_code = error.response.status_code
+        elif isinstance(error, (
+            requests.exceptions.Timeout,
+            requests.exceptions.ConnectionError,
+            requests.exceptions.ChunkedEncodingError,
+            requests.exceptions.ContentDecodingError,
+            ValueError,  # 包括json.JSONDecodeError
+        )):
+            return True
+        return status_code in RETRYABLE_STATUS
+    
+    def backoff(self, attempt, retry_after=None):
+        """
+        计算第attempt次重试前的等待时间
+        
+        在 [0, min(上限, 基数 * 2^attempt)] 中随机取值，避免多个线程和进程同时重试；
+        服务端给出Retry-After时至少等待该时长。
+        
+        Args:
+            attempt (int): 已失败的次数减1
+            retry_after (str|None): 响应头Retry-After的值
+        
+        Returns:
+            float: 等待秒数
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        try:
+            delay = max(delay, min(self.backoff_max, float(retry_after)))
+        except (TypeError, ValueError):
+            pass
+        return delay
+    
+    def call(self, url, attempt):
+        """
+        按策略执行一次请求
+        
+        Args:
+            url (str): 请求地址，用于熔断和统计
+            attempt (callable): 发出一次请求，返回 (结果, HTTP状态码, Retry-After)；出错时抛出异常
+        
+        Returns:
+            object: 最后一次请求的结果；状态码可重试但已用完重试次数时原样返回，由调用方处理
+        """
+        host = urlparse(url).hostname or ''
+        for attempt_num in range(self.retries + 1):
+            wait = self.breaker.wait_time(host)
+            if wait > 0:
+                if attempt_num == self.retries:
+                    self._count(host, failures=1)
+                    raise CircuitOpenError(f"{host} 处于熔断状态")
+                print(f"{host} 处于熔断状态，{wait:.1f}秒后重试")
+                self._count(host, retries=1)
+                time.sleep(wait)
+                continue
+            
+            start = time.time()
+            try:
+                result, status_code, retry_after = attempt()
+                error = None
+            except Exception as e:
+                result, status_code, error = None, None, e
+                response = getattr(e, 'response', None)
+                retry_after = response.headers.get('Retry-After') if response is not None else None
+            latency = time.time() - start
+            retryable = self.is_retryable(error, status_code)
+            self.record(url, not retryable, latency)
+            
+            if not retryable or attempt_num == self.retries:
+                if error is not None or retryable:
+                    self._count(host, failures=1)
+                if error is not None:
+                    raise error
+                return result
+            
+            # 丢弃这次的响应，释放连接
+            if hasattr(result, 'close'):
+                result.close()
+            delay = self.backoff(attempt_num, retry_after)
+            reason = error or f"HTTP状态码 {status_code}"
+            print(f"请求失败: {url} ({reason})，{delay:.1f}秒后重试({attempt_num + 1}/{self.retries})")
+            self._count(host, retries=1)
+            time.sleep(delay)
+    
+    def allow(self, url, reserve=True):
+        """
+        不等待地检查熔断器，供自行调度请求的调用方（如并行文件下载）在发出请求前使用
+        
+        Args:
+            url (str): 请求地址
+            reserve (bool): 冷却结束时是否占用试探请求的名额；True时调用方必须随后发出请求并调用record
+        
+        Returns:
+            bool: 是否可以发出请求
+        """
+        return self.breaker.wait_time(urlparse(url).hostname or '', reserve) <= 0
+    
+    def record(self, url, success, latency=None):
+        """
+        记录一次已发出的请求的结果
+        
+        Args:
+            url (str): 请求地址
+            success (bool): 是否成功（不可重试的错误如404也算成功，说明主机可用）
+            latency (float|None): 耗时（秒）
+        
+        Returns:
+            bool: 本次失败是否导致熔断
+        """
+        host = urlparse(url).hostname or ''
+        opened = self.breaker.record(host, success)
+        self._count(host, sent=1, latency=latency, circuit_opens=int(opened))
+        if opened:
+            print(f"{host} 连续失败，熔断 {self.breaker.cooldown:g} 秒")
+        return opened
+    
+    def retry_delay(self, url, attempt, retry_after=None):
+        """
+        记录一次重试并返回重试前应等待的秒数
+        
+        Args:
+            url (str): 请求地址
+            attempt (int): 已失败的次数减1
+            retry_after (str|None): 响应头Retry-After的值
+        
+        Returns:
+            float: 等待秒数
+        """
+        self._count(urlparse(url).hostname or '', retries=1)
+        return self.backoff(attempt, retry_after)
+    
+    def record_failure(self, url):
+        """记录一个重试后仍失败的请求"""
+        self._count(urlparse(url).hostname or '', failures=1)
+    
+    def _count(self, host, sent=0, retries=0, failures=0, circuit_opens=0, latency=None):
+        """累加主机的统计"""
+        with self._lock:
+            stats = self.stats.setdefault(host, {
+                'requests': 0, 'retries': 0, 'failures': 0, 'circuit_opens': 0,
+                'latency_total': 0.0, 'latency_max': 0.0
+            })
+            stats['requests'] += sent
+            stats['retries'] += retries
+            stats['failures'] += failures
+            stats['circuit_opens'] += circuit_opens
+            if latency is not None:
+                stats['latency_total'] += latency
+                stats['latency_max'] = max(stats['latency_max'], latency)
+    
+    def reset_stats(self):
+        """清零统计"""
+        with self._lock:
+            self.stats = {}
+    
+    def describe(self):
+        """
+        各主机的请求统计
+        
+        Returns:
+            dict: 主机名 -> {'requests', 'retries', 'failures', 'circuit_opens', 'avg_latency', 'max_latency'}
+        """
+        with self._lock:
+            return {
+                host: {
+                    'requests': stats['requests'],
+                    'retries': stats['retries'],
+                    'failures': stats['failures'],
+                    'circuit_opens': stats['circuit_opens'],
+                    'avg_latency': round(stats['latency_total'] / stats['requests'], 3) if stats['requests'] else 0,
+                    'max_latency': round(stats['latency_max'], 3)
+                }
+                for host, stats in self.stats.items()
+            }
@@ -0,0 +1,179 @@
+"""
+运行断点模块 - 逐页记录每个分类的进度，进程中断后从断点继续
+"""
+import threading
+
+def announcement_key(announcement):
+    """公告在断点中的键：公告ID，没有时用附件地址"""
+    return str(announcement.get('announcementId') or announcement.get('adjunctUrl') or '')
+
+class RunCheckpoint:
+    """
+    单只股票一次运行的断点
+    
+    每个分类记录下一页的页码、每页条数、查询日期区间、已有的统计，以及已列出但尚未下载完成的公告，
+    每处理完一页写入下载记录数据库。续传时已完成的分类直接跳过；进行中的分类先重新提交未完成的公告，
+    再从记录的页码继续翻页，已处理的页不再请求，已下载完成的文件也不再检查；列表已获取完的分类只重新提交未完成的公告，
+    不再请求列表。
+    中断时正在处理的页中可能有公告已经下载完成，这些公告遇到已存在的文件不应触发增量更新的跳过分类，
+    用is_resumed判断。
+    列表有页面获取失败的分类结束时不标记完成，续传时从第1页重新获取。
+    """
+    
+    def __init__(self, manifest, stock_code, resume=False):
+        """
+        Args:
+            manifest (DownloadManifest): 下载记录，断点保存在同一个数据库中
+            stock_code (str): 股票代码
+            resume (bool): 是否从上次的断点继续，False时清除旧断点
+        """
+        self.manifest = manifest
+        self.stock_code = stock_code
+        self._lock = threading.Lock()
+        # 分类名 -> {'stats', 'pending', 'page', 'page_size', 'se_date', 'listed', 'complete', 'resuming', 'resumed'}
+        self._categories = {}
+        if resume:
+            self.saved = manifest.get_checkpoints(stock_code)
+        else:
+            manifest.clear_checkpoints(stock_code)
+            self.saved = {}
+    
+    def is_done(self, category_name):
+        """分类在上次运行中是否已完成"""
+        return bool((self.saved.get(category_name) or {}).get('done'))
+    
+    def saved_stats(self, category_name):
+        """上次运行记录的分类统计，没有时返回None"""
+        return (self.saved.get(category_name) or {}).get('stats')
+    
+    def saved_se_date(self, category_name):
+        """上次运行使用的查询日期区间，没有时返回None"""
+        return (self.saved.get(category_name) or {}).get('se_date')
+    
+    def is_listed(self, category_name):
+        """上次运行中分类的公告列表是否已获取完（只剩未完成的下载），是则续传时不再请求列表"""
+        return bool((self.saved.get(category_name) or {}).get('listed'))
+    
+    def begin(self, category_name, stats, se_date=''):
+        """
+        开始处理分类，恢复上次的统计
+        
+        Args:
+            category_name (str): 分类名
+            stats (dict): 分类统计，原地恢复为上次记录的值
+            se_date (str): 查询日期区间
+        
+        Returns:
+            tuple: (起始页码, 每页条数（None表示自动选择）, 需要重新提交的公告列表)
+        """
+        saved = self.saved.get(category_name) or {}
+        stats.update(saved.get('stats') or {})
+        pending = dict(saved.get('pending') or {})
+        state = {
+            'stats': stats,
+            'pending': pending,
+            'page': saved.get('page') or 1,
+            'page_size': saved.get('page_size'),
+            'se_date': se_date,
+            'listed': False,
+            # 上次已获取完列表时沿用当时列表是否完整
+            'complete': saved.get('complete', True) if saved.get('listed') else True,
+            # 上次运行已开始处理该分类时，起始页中的公告可能已处理过
+            'resuming': bool(saved),
+            'resumed': set(pending)
+        }
+        with self._lock:
+            self._categories[category_name] = state
+            if not saved:
+                self._save(category_name, state, done=False)
+        if saved.get('listed'):
+            print(f"断点续传：分类 {category_name} 的列表已获取完，重新提交 {len(pending)} 个未完成的公告")
+        elif state['page'] > 1 or pending:
+            print(f"断点续传：分类 {category_name} 从第{state['page']}页继续，重新提交 {len(pending)} 个未完成的公告")
+        return state['page'], state['page_size'], list(pending.values())
+    
+    def track(self, category_name, announcement):
+        """记录已列出、尚未处理完的公告"""
+        key = announcement_key(announcement)
+        with self._lock:
+            state = self._categories[category_name]
+            state['pending'][key] = announcement
+            if state['resuming']:
+                state['resumed'].add(key)
+    
+    def is_resumed(self, category_name, announcement):
+        """公告是否是重新提交的或属于中断时正在处理的页（可能在中断前已下载完成）"""
+        with self._lock:
+            state = self._categories.get(category_name)
+            return state is not None and announcement_key(announcement) in state['resumed']
+    
+    def release(self, category_name, key):
+        """
+        公告已处理完（被过滤、跳过、下载成功或失败），列表也已获取完时分类完成
+        
+        Args:
+            category_name (str): 分类名
+            key (str): announcement_key返回的键
+        """
+        with self._lock:
+            state = self._categories.get(category_name)
+            if state is None:
+                return
+            state['pending'].pop(str(key), None)
+            self._finish_if_idle(category_name, state)
+    
+    def page_done(self, category_name, next_page, page_size):
+        """
+        一页公告已全部交给下载阶段，保存断点
+        
+        Args:
+            category_name (str): 分类名
+            next_page (int): 下一页的页码
+            page_size (int): 每页条数
+        """
+        with self._lock:
+            state = self._categories[category_name]
+            state['resuming'] = False
+            state['page'] = next_page
+            state['page_size'] = page_size
+            self._save(category_name, state, done=False)
+    
+    def list_done(self, category_name, complete=True):
+        """
+        分类的公告列表已获取完，还有未完成的公告时保存断点，续传时不再请求列表
+        
+        Args:
+            category_name (str): 分类名
+            complete (bool): 列表是否完整，有页面获取失败时为False
+        """
+        with self._lock:
+            state = self._categories[category_name]
+            state['listed'] = True
+            state['complete'] = state['complete'] and complete
+            if state['pending']:
+                self._save(category_name, state, done=False)
+            self._finish_if_idle(category_name, state)
+    
+    def _finish_if_idle(self, category_name, state):
+        """列表已获取完且没有未处理的公告时保存分类的最终状态"""
+        if not state['listed'] or state['pending']:
+            return
+        if state['complete']:
+            self._save(category_name, state, done=True)
+        else:
+            # 列表不完整，续传时重新获取整个分类
+            self.manifest.save_checkpoint(self.stock_code, category_name, {'page': 1, 'se_date': state['se_date'], 'done': False})
+        state['listed'] = False
+    
+    def _save(self, category_name, state, done):
+        """写入分类的断点"""
+        self.manifest.save_checkpoint(self.stock_code, category_name, {
+            'page': state['page'],
+            'page_size': state['page_size'],
+            'se_date': state['se_date'],
+            'stats': dict(state['stats']),
+            'pending': dict(state['pending']),
+            'listed': state['listed'],
+            'complete': state['complete'],
+            'done': done
+        })
@@ -0,0 +1,301 @@
+"""
+股票目录模块 - 本地保存全市场股票的代码、机构ID、简称、拼音和板块，离线解析股票
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+
+# 巨潮全市场股票列表，返回 {"stockList": [{"code", "orgId", "zwjc", "pinyin", "category"}, ...]}
+DEFAULT_SNAPSHOT_URLS = "https://www.cninfo.com.cn/new/data/szse_stock.json"
+
+# 股票信息字段 -> 数据库列名
+FIELDS = {
+    'code': 'code', 'orgId': 'org_id', 'zwjc': 'zwjc', 'pinyin': 'pinyin',
+    'category': 'category', 'sjstsBond': 'sjsts_bond', 'plate': 'plate'
+}
+
+def snapshot_plate(item):
+    """
+    由全市场股票列表中的机构ID和股票代码推断板块代码
+    
+    Args:
+        item (dict): 股票信息
+    
+    Returns:
+        str: szse、sse或bj，无法判断时返回None
+    """
+    org_id = item.get('orgId') or ''
+    for prefix, plate in (('gssz', 'szse'), ('gssh', 'sse'), ('gfbj', 'bj')):
+        if org_id.startswith(prefix):
+            return plate
+    code = str(item.get('code') or '')
+    if len(code) != 6 or not code.isdigit():
+        return None
+    # 北交所920开头，其余9开头为沪市B股
+    if code.startswith(('92', '4', '8')):
+        return 'bj'
+    if code.startswith(('6', '9')):
+        return 'sse'
+    return 'szse'
+
+class StockDirectory:
+    """
+    股票目录
+    
+    保存在SQLite文件中（WAL模式），每只股票一行，字段与股票搜索接口一致（code、orgId、zwjc、pinyin、sjstsBond），
+    另含板块代码plate。可从巨潮的全市场股票列表或本地快照文件整体导入，板块按机构ID和股票代码推断；
+    按设定的天数自动刷新。在线搜索到的股票和从股票页面解析到的板块按行写入，下次直接使用。
+    多线程各自持有连接，批量模式下多个进程可同时读写。
+    """
+    
+    def __init__(self, path, snapshot_urls=DEFAULT_SNAPSHOT_URLS, refresh_days=7):
+        """
+        Args:
+            path (str): 目录数据库文件路径
+            snapshot_urls (str): 全市场股票列表地址，多个用逗号分隔
+            refresh_days (float): 超过多少天自动刷新，0表示不自动刷新
+        """
+        self.path = path
+        self.snapshot_urls = [url.strip() for url in (snapshot_urls or '').split(',') if url.strip()]
+        self.refresh_days = float(refresh_days)
+        self._local = threading.local()
+        self._connect()
+        self._import_legacy()
+    
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM stocks").fetchone()[0]
+    
+    def _connect(self):
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stocks ("
+                "code TEXT PRIMARY KEY, org_id TEXT, zwjc TEXT, pinyin TEXT, category TEXT, "
+                "sjsts_bond TEXT, plate TEXT, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+    
+    def _import_legacy(self):
+        """早期版本的目录保存在同名的JSON文件中，目录为空时导入一次"""
+        legacy_path = os.path.splitext(self.path)[0] + '.json'
+        if legacy_path == self.path or not os.path.exists(legacy_path) or len(self):
+            return
+        try:
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取旧版股票目录失败: {e}")
+            return
+        self._upsert((data.get('stocks') or {}).values(), keep_plate=False)
+        self._set_updated_at(data.get('updated_at', 0))
+        print(f"已导入旧版股票目录: {legacy_path}")
+    
+    @property
+    def updated_at(self):
+        """上次整体刷新的时间戳，从未刷新时为0"""
+        row = self._connect().execute("SELECT value FROM meta WHERE name = 'updated_at'").fetchone()
+        return float(row[0]) if row else 0
+    
+    def _set_updated_at(self, updated_at):
+        """记录整体刷新的时间"""
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('updated_at', ?)", (str(updated_at),))
+        conn.commit()
+    
+    def _upsert(self, entries, keep_plate):
+        """
+        按行写入股票，只更新给出的字段
+        
+        Args:
+            entries (iterable): 股票信息列表
+            keep_plate (bool): 已有板块时是否保留（推断出的板块不覆盖从股票页面解析到的板块）
+        """
+        columns = list(FIELDS.values())
+        updates = ', '.join(
+            f"{column} = COALESCE(stocks.{column}, excluded.{column})" if column == 'plate' and keep_plate
+            else f"{column} = COALESCE(excluded.{column}, stocks.{column})"
+            for column in columns[1:]
+        )
+        now = time.time()
+        rows = [
+            tuple(None if entry.get(field) is None else str(entry[field]) for field in FIELDS) + (now,)
+            for entry in entries if entry.get('code')
+        ]
+        conn = self._connect()
+        conn.executemany(
+            f"INSERT INTO stocks ({', '.join(columns)}, updated_at) VALUES ({', '.join('?' * (len(columns) + 1))}) "
+            f"ON CONFLICT(code) DO UPDATE SET {updates}, updated_at = excluded.updated_at",
+            rows
+        )
+        conn.commit()
+        return len(rows)
+    
+    def _entry(self, row):
+        """数据库行转为股票信息，省略空字段"""
+        return {field: row[column] for field, column in FIELDS.items() if row[column] is not None}
+    
+    def lookup(self, stock_code):
+        """
+        按股票代码精确查找
+        
+        Args:
+            stock_code (str): 股票代码
+        
+        Returns:
+            dict: 股票信息，不存在时返回None
+        """
+        row = self._connect().execute("SELECT * FROM stocks WHERE code = ?", (str(stock_code).strip(),)).fetchone()
+        return self._entry(row) if row else None
+    
+    def search(self, keyword, limit=10):
+        """
+        按代码前缀、拼音首字母前缀或简称前缀查找
+        
+        Args:
+            keyword (str): 关键字，如 "6012"、"sxmy"、"陕西"
+            limit (int): 最多返回条数
+        
+        Returns:
+            list: 股票信息列表，精确匹配的排在最前面
+        """
+        keyword = str(keyword).strip().lower()
+        if not keyword:
+            return []
+        pattern = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        rows = self._connect().execute(
+            "SELECT * FROM stocks WHERE code LIKE ? ESCAPE '\\' OR lower(pinyin) LIKE ? ESCAPE '\\' OR zwjc LIKE ? ESCAPE '\\' "
+            "ORDER BY (code = ? OR lower(pinyin) = ? OR zwjc = ?) DESC, code LIMIT ?",
+            (pattern, pattern, pattern, keyword, keyword, keyword, limit)
+        ).fetchall()
+        return [self._entry(row) for row in rows]
+    
+    def count_plates(self):
+        """已知板块的股票数"""
+        return self._connect().execute("SELECT COUNT(*) FROM stocks WHERE plate IS NOT NULL").fetchone()[0]
+    
+    def add(self, stock_info, plate=None):
+        """
+        补充或更新一只股票
+        
+        Args:
+            stock_info (dict): 股票搜索接口返回的股票信息
+            plate (str): 板块代码
+        """
+        code = stock_info.get('code')
+        if not code:
+            return
+        entry = {field: stock_info[field] for field in ('code', 'orgId', 'zwjc', 'pinyin', 'category', 'sjstsBond') if stock_info.get(field) is not None}
+        if plate:
+            entry['plate'] = plate
+        existing = self.lookup(code) or {}
+        if all(existing.get(field) == str(value) for field, value in entry.items()):
+            return
+        try:
+            self._upsert([entry], keep_plate=False)
+        except sqlite3.Error as e:
+            print(f"保存股票目录失败: {e}")
+    
+    def set_plate(self, stock_code, plate):
+        """记录股票的板块代码"""
+        entry = self.lookup(stock_code)
+        if entry and entry.get('plate') != plate:
+            self.add(entry, plate)
+    
+    def import_snapshot(self, data):
+        """
+        导入全市场股票列表，按机构ID和股票代码补充板块
+        
+        Args:
+            data (dict|list): {"stockList": [...]} 或股票信息列表
+        
+        Returns:
+            int: 导入的股票数
+        """
+        items = data.get('stockList') or [] if isinstance(data, dict) else data
+        entries = []
+        for item in items:
+            if item.get('code') and item.get('orgId'):
+                entries.append({**item, 'plate': item.get('plate') or snapshot_plate(item)})
+        count = self._upsert(entries, keep_plate=True)
+        self._set_updated_at(time.time())
+        return count
+    
+    def is_stale(self):
+        """是否需要自动刷新"""
+        return self.refresh_days > 0 and time.time() - self.updated_at > self.refresh_days * 86400
+    
+    def refresh(self, http_client):
+        """
+        下载全市场股票列表并导入
+        
+        Args:
+            http_client (HttpClient): 共享HTTP客户端
+        
+        Returns:
+            int: 导入的股票数，失败时返回0
+        """
+        items = []
+        for url in self.snapshot_urls:
+            try:
+                data = http_client.get_json(url)
+                items.extend(data.get('stockList') or [] if isinstance(data, dict) else data)
+            except Exception as e:
+                print(f"下载股票列表失败: {url} ({e})")
+                return 0
+        if not items:
+            return 0
+        count = self.import_snapshot(items)
+        print(f"股票目录已刷新: {count} 只股票")
+        return count
+    
+    def refresh_if_stale(self, http_client):
+        """超过刷新天数时刷新目录"""
+        if self.is_stale():
+            print("股票目录已过期，正在刷新")
+            self.refresh(http_client)
+
+def main():
+    """主函数"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    from config import Config
+    from http_client import HttpClient
+    
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    directory = Config.create_stock_directory()
+    if command == 'refresh':
+        if not directory.refresh(HttpClient(retry_policy=Config.create_retry_policy())):
+            sys.exit(1)
+    elif command == 'import' and len(sys.argv) > 2:
+        with open(sys.argv[2], 'r', encoding='utf-8') as f:
+            count = directory.import_snapshot(json.load(f))
+        print(f"已导入 {count} 只股票")
+    elif command == 'search' and len(sys.argv) > 2:
+        for entry in directory.search(sys.argv[2]):
+            print(f"{entry.get('code', ''):<8}{entry.get('zwjc', ''):<10}{entry.get('pinyin', ''):<10}{entry.get('orgId', ''):<16}{entry.get('plate', '')}")
+    elif command == 'info':
+        updated = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(directory.updated_at)) if directory.updated_at else '从未刷新'
+        print(f"股票目录: {directory.path}")
+        print(f"股票数: {len(directory)}，已知板块: {directory.count_plates()}")
+        print(f"刷新时间: {updated}")
+    else:
+        print("使用方法:")
+        print("  python stock_directory.py info            # 查看股票目录信息")
+        print("  python stock_directory.py refresh         # 下载全市场股票列表")
+        print("  python stock_directory.py import <文件>   # 导入本地股票列表快照")
+        print("  python stock_directory.py search <关键字> # 按代码、拼音或简称前缀查找")
+
+if __name__ == "__main__":
+    main()
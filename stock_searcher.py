@@ -3,17 +3,26 @@
 """
 import requests
 import json
+from http_client import HttpClient
 
 class StockSearcher:
     """股票搜索类"""
     
-    def __init__(self, cache_manager=None):
+    def __init__(self, cache_manager=None, http_client=None, stock_directory=None):
+        """
+        Args:
+            cache_manager (CacheManager): 缓存管理器
+            http_client (HttpClient): 共享HTTP客户端
+            stock_directory (StockDirectory): 本地股票目录，优先从中查找
+        """
         self.search_url = "https://www.cninfo.com.cn/new/information/topSearch/query"
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Content-Type': 'application/x-www-form-urlencoded'
         }
         self.cache_manager = cache_manager
+        self.http_client = http_client or HttpClient()
+        self.stock_directory = stock_directory
     
     def search_stock(self, stock_code, max_num=10):
         """
@@ -22,16 +31,26 @@ class StockSearcher:
         Args:
             stock_code (str): 股票代码
             max_num (int): 最大返回数量
-            
+        
         Returns:
             dict: 股票信息字典，包含code, orgId, sjstsBond, zwjc等字段
         """
+        # 先查本地股票目录
+        if self.stock_directory is not None:
+            entry = self.stock_directory.lookup(stock_code)
+            if entry and entry.get('orgId'):
+                # 全市场股票列表中没有sjstsBond，普通股票为false
+                stock_info = {'sjstsBond': 'false', **entry}
+                print(f"使用股票目录获取股票信息: {stock_info.get('zwjc', '')} ({stock_info.get('code', '')})")
+                return stock_info
+        
         # 检查缓存
         if self.cache_manager:
             cached_data = self.cache_manager.load_top_search_cache(stock_code, max_num)
-            if cached_data and len(cached_data) > 0:
-                stock_info = cached_data[0]  # 取第一个匹配结果
+            stock_info = self._pick(cached_data, stock_code) if cached_data else None
+            if stock_info:
                 print(f"使用缓存获取股票信息: {stock_info.get('zwjc', '')} ({stock_info.get('code', '')})")
+                self._remember(stock_info)
                 return stock_info
         
         try:
@@ -40,23 +59,25 @@ class StockSearcher:
                 'maxNum': max_num
             }
             
-            response = requests.post(self.search_url, data=data, headers=self.headers)
-            response.raise_for_status()
-            
-            result = response.json()
+            result = self.http_client.post_json(self.search_url, data=data, headers=self.headers)
             
             # 保存到缓存
             if self.cache_manager and result:
                 self.cache_manager.save_top_search_cache(stock_code, max_num, result)
             
-            if result and len(result) > 0:
-                stock_info = result[0]  # 取第一个匹配结果
+            stock_info = self._pick(result, stock_code) if result else None
+            if stock_info:
                 print(f"成功获取股票信息: {stock_info.get('zwjc', '')} ({stock_info.get('code', '')})")
+                self._remember(stock_info)
                 return stock_info
+            elif result:
+                candidates = '、'.join(f"{item.get('zwjc', '')}({item.get('code', '')})" for item in result[:5])
+                print(f"未找到与 {stock_code} 完全匹配的股票，候选: {candidates}")
+                return None
             else:
                 print(f"未找到股票代码 {stock_code} 的信息")
                 return None
-                
+        
         except requests.exceptions.RequestException as e:
             print(f"请求股票信息失败: {e}")
             return None
@@ -65,4 +86,30 @@ class StockSearcher:
             return None
         except Exception as e:
             print(f"搜索股票时发生错误: {e}")
-            return None 
\ No newline at end of file
+            return None
+    
+    def _pick(self, result, keyword):
+        """
+        从搜索结果中选出与关键字完全匹配的股票
+        
+        搜索接口按相关度返回多只股票，第一个不一定是要找的股票。
+        依次按代码、简称、拼音完全匹配。
+        
+        Args:
+            result (list): 搜索结果
+            keyword (str): 搜索关键字
+        
+        Returns:
+            dict: 股票信息，没有完全匹配的返回None
+        """
+        keyword = str(keyword).strip()
+        for field in ('code', 'zwjc', 'pinyin'):
+            for item in result:
+                if str(item.get(field) or '').lower() == keyword.lower():
+                    return item
+        return None
+    
+    def _remember(self, stock_info):
+        """把在线搜索到的股票补充进本地股票目录"""
+        if self.stock_directory is not None:
+            self.stock_directory.add(stock_info)
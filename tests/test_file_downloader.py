@@ -0,0 +1,130 @@
+"""
+文件下载模块测试 - 断点续传遇到不支持Range的服务端，主机持续出错时熔断
+"""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from file_downloader import FileDownloader, DownloadTask
+from http_client import HttpClient
+from retry_policy import RetryPolicy, CircuitBreaker
+
+BODY = b'%PDF-1.4\n' + b'x' * 40000
+
+class IgnoreRangeHandler(BaseHTTPRequestHandler):
+    """忽略Range请求头，总是返回200和完整文件"""
+    
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+    
+    def log_message(self, *args):
+        pass
+
+class RangeHandler(IgnoreRangeHandler):
+    """支持 bytes=N- 形式的Range请求"""
+    
+    def do_GET(self):
+        range_header = self.headers.get('Range', '')
+        if not range_header.startswith('bytes='):
+            return super().do_GET()
+        start = int(range_header[len('bytes='):].split('-')[0])
+        self.send_response(206)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Range', f'bytes {start}-{len(BODY) - 1}/{len(BODY)}')
+        self.send_header('Content-Length', str(len(BODY) - start))
+        self.end_headers()
+        self.wfile.write(BODY[start:])
+
+class ResumeDownloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.tmp_dir, 'announcement.pdf')
+        # 上次中断留下的.part
+        with open(self.file_path + '.part', 'wb') as f:
+            f.write(BODY[:10000])
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def _download(self, handler):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            downloader = FileDownloader()
+            task = DownloadTask(f'http://127.0.0.1:{server.server_port}/announcement.pdf', self.file_path, len(BODY) // 1024)
+            downloader.submit(task)
+            downloader.wait_all()
+            return task
+        finally:
+            server.shutdown()
+            server.server_close()
+    
+    def _assert_complete(self, task):
+        self.assertTrue(task.success)
+        with open(self.file_path, 'rb') as f:
+            self.assertEqual(f.read(), BODY)
+        self.assertFalse(os.path.exists(self.file_path + '.part'))
+    
+    def test_server_ignores_range(self):
+        task = self._download(IgnoreRangeHandler)
+        self._assert_complete(task)
+        # 从头下载不计入重试次数
+        self.assertEqual(task.attempt, 0)
+    
+    def test_server_supports_range(self):
+        task = self._download(RangeHandler)
+        self._assert_complete(task)
+        self.assertFalse(task.range_reset)
+
+class UnavailableHandler(IgnoreRangeHandler):
+    """总是返回503"""
+    
+    requests = 0
+    
+    def do_GET(self):
+        UnavailableHandler.requests += 1
+        self.send_response(503)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', '4')
+        self.end_headers()
+        self.wfile.write(b'busy')
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def test_unavailable_host_opens_circuit(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), UnavailableHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        policy = RetryPolicy(backoff_base=0.05, backoff_max=0.1, breaker=CircuitBreaker(threshold=2, cooldown=0.2))
+        try:
+            downloader = FileDownloader(max_concurrent=2, http_client=HttpClient(retry_policy=policy))
+            for i in range(6):
+                downloader.submit(DownloadTask(
+                    f'http://127.0.0.1:{server.server_port}/{i}.pdf', os.path.join(self.tmp_dir, f'{i}.pdf'), 1
+                ))
+            tasks = downloader.wait_all()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(len(tasks), 6)
+        self.assertFalse(any(task.success for task in tasks))
+        stats = policy.describe()['127.0.0.1']
+        self.assertGreater(stats['circuit_opens'], 0)
+        self.assertEqual(stats['failures'], 6)
+        # 熔断后等待中的任务不再各自重试3次
+        self.assertLess(UnavailableHandler.requests, 6 * 3)
+
+if __name__ == '__main__':
+    unittest.main()